@@ -3,33 +3,51 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from crawl4ai import AsyncWebCrawler, BrowserConfig
+import threading
 
-from api.database import Base, engine
-from api.routers import profiles, trigger, articles, dashboard, detector, emails
+from api.database import Base, SessionLocal, engine
+from api.routers import profiles, trigger, articles, dashboard, detector, emails, metrics, health
 from api.scheduler import start_scheduler
 from api.config import setup_logging
-from api.ml_models import load_models
+from api.ml_models import start_loading_models
+from api.utils import extraction, inference_workers
+from api.utils.browser_pool import browser_pool
+from api.utils.fetcher import fetcher
+from api.utils.near_duplicates import near_duplicates
+from api.utils.url_filter import seen_urls
 
 # Setup logging
 setup_logging()
 
 
+def rebuild_seen_urls():
+    db = SessionLocal()
+    try:
+        seen_urls.rebuild(db)
+        near_duplicates.rebuild(db)
+    finally:
+        db.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting up...")
     start_scheduler()
-    # Load ML models at startup
-    load_models()
-    print("ML models loaded.")
-    browser_config = BrowserConfig(headless=True, verbose=True)
-    crawler = AsyncWebCrawler(config=browser_config)
-    await crawler.start()
-    # Store crawler in app state
-    app.state.crawler = crawler
+    # Load ML models in the background so non-ML routes serve right away;
+    # readiness is reported at /health/ready
+    if inference_workers.enabled():
+        inference_workers.start_pool()
+    else:
+        start_loading_models()
+    # Until the seen-URL filter is built, dedup falls back to querying every candidate;
+    # until the near-duplicate index is built, only articles saved since startup are matched
+    threading.Thread(target=rebuild_seen_urls, name="seen-urls", daemon=True).start()
     yield
     # Cleanup code can be added here if needed
-    await crawler.close()
+    browser_pool.close()
+    extraction.shutdown_pool()
+    inference_workers.shutdown_pool()
+    fetcher.close()
     print("Shutting down...")
     
 app = FastAPI(lifespan=lifespan)
@@ -41,6 +59,8 @@ app.include_router(articles.router, prefix="/articles", tags=["Articles"])
 app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
 app.include_router(detector.router, prefix="/detect", tags=["Detect"])
 app.include_router(emails.router, prefix="/emails", tags=["Emails"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(health.router, prefix="/health", tags=["Health"])
 
 app.add_middleware(
     CORSMiddleware,
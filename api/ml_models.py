@@ -1,37 +1,202 @@
-from transformers import AutoTokenizer, TFAutoModelForSequenceClassification
+from transformers import AutoConfig, AutoTokenizer, TFAutoModelForSequenceClassification
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
 import logging
+import threading
+import time
 
 ml_models = {}
 HF_TOKEN = os.getenv("HF_TOKEN")
 
-def load_models():
-    global ml_models
+# "tf" runs the TF checkpoints directly, "onnx" serves ONNX exports through onnxruntime
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tf").lower()
 
-    sentiment_model_path = "binbasri1/roberta-twitter-sentiment-tf"
-    news_model_path = "binbasri1/distilbert-news-classifier-custom"
+MODEL_PATHS = {
+    "sentiment": os.getenv("SENTIMENT_MODEL_PATH", "binbasri1/roberta-twitter-sentiment-tf"),
+    "news": os.getenv("NEWS_MODEL_PATH", "binbasri1/distilbert-news-classifier-custom"),
+}
 
-    try:
-        print(f"Loading sentiment model from: {sentiment_model_path}")
-        ml_models["sentiment_model"] = TFAutoModelForSequenceClassification.from_pretrained(
-            sentiment_model_path, token=HF_TOKEN
-        )
-        ml_models["sentiment_tokenizer"] = AutoTokenizer.from_pretrained(
-            sentiment_model_path, token=HF_TOKEN
-        )
-    except Exception as e:
-        logging.error(f"Failed to load sentiment model: {e}")
+# Local artifact directory: models are loaded from MODEL_DIR/<kind> without a
+# hub round-trip when present, and saved there after the first download.
+MODEL_DIR = os.getenv("MODEL_DIR")
+TF_WEIGHTS_FILES = ("tf_model.h5", "tf_model.h5.index.json")
+# Lazy loading defers each model to its first prediction instead of startup
+LAZY_MODEL_LOADING = os.getenv("LAZY_MODEL_LOADING", "false").lower() == "true"
+# Wrap TF models in graph functions with fixed padded shapes, warmed up at load time.
+# Off by default: compiled buckets are padded to their edge, not their longest sequence.
+COMPILE_MODELS = os.getenv("COMPILE_MODELS", "false").lower() == "true"
 
-    try:
-        print(f"Loading news model from: {news_model_path}")
-        ml_models["news_model"] = TFAutoModelForSequenceClassification.from_pretrained(
-            news_model_path, token=HF_TOKEN
-        )
-        ml_models["news_tokenizer"] = AutoTokenizer.from_pretrained(
-            news_model_path, token=HF_TOKEN
-        )
-    except Exception as e:
-        logging.error(f"Failed to load news model: {e}")
+model_status = {
+    kind: {"state": "not_loaded", "source": None, "load_seconds": None, "compile": None, "error": None}
+    for kind in MODEL_PATHS
+}
+_load_locks = {kind: threading.Lock() for kind in MODEL_PATHS}
+_revisions = {}
+
+
+class ModelNotReadyError(RuntimeError):
+    pass
+
+
+def _artifact_dir(kind: str):
+    return os.path.join(MODEL_DIR, kind) if MODEL_DIR else None
+
+def _has_local_weights(kind: str, local_dir: str) -> bool:
+    if any(os.path.exists(os.path.join(local_dir, name)) for name in TF_WEIGHTS_FILES):
+        return True
+    # ONNX mode saves only the tokenizer and config; they suffice while the export is cached
+    if INFERENCE_BACKEND == "onnx":
+        from api.utils.onnx_backend import onnx_model_path
+        return os.path.exists(onnx_model_path(kind, MODEL_PATHS[kind]))
+    return False
+
+def _resolve_source(kind: str):
+    local_dir = _artifact_dir(kind)
+    if local_dir and os.path.exists(os.path.join(local_dir, "config.json")) and _has_local_weights(kind, local_dir):
+        return local_dir, True
+    return MODEL_PATHS[kind], False
+
+def load_classifier(kind: str, source: str, **kwargs):
+    if INFERENCE_BACKEND == "onnx":
+        from api.utils.onnx_backend import load_onnx_model
+        return load_onnx_model(kind, MODEL_PATHS[kind], token=HF_TOKEN, source=source)
+    return TFAutoModelForSequenceClassification.from_pretrained(source, **kwargs)
+
+def _save_artifacts(kind: str, source: str, model, tokenizer):
+    local_dir = _artifact_dir(kind)
+    os.makedirs(local_dir, exist_ok=True)
+    tokenizer.save_pretrained(local_dir)
+    if INFERENCE_BACKEND == "onnx":
+        # The ONNX export is cached on its own; keep the config so the tokenizer loads offline
+        AutoConfig.from_pretrained(source, token=HF_TOKEN).save_pretrained(local_dir)
+    else:
+        model.save_pretrained(local_dir)
+    logging.info(f"Saved {kind} model artifacts to {local_dir}")
+
+def load_model(kind: str):
+    """Load one model and its tokenizer. Concurrent callers wait for the same load."""
+    with _load_locks[kind]:
+        status = model_status[kind]
+        if status["state"] == "ready":
+            return
+
+        source, is_local = _resolve_source(kind)
+        kwargs = {"local_files_only": True} if is_local else {"token": HF_TOKEN}
+        status.update(state="loading", source=source, error=None)
+        started = time.perf_counter()
+        try:
+            print(f"Loading {kind} model from: {source}")
+            tokenizer = AutoTokenizer.from_pretrained(source, **kwargs)
+            model = load_classifier(kind, source, **kwargs)
+            if MODEL_DIR and not is_local:
+                _save_artifacts(kind, source, model, tokenizer)
+            if COMPILE_MODELS and INFERENCE_BACKEND == "tf":
+                from api.utils.compiled_models import compile_classifier
+                model, status["compile"] = compile_classifier(kind, model)
+        except Exception as e:
+            logging.error(f"Failed to load {kind} model: {e}")
+            status.update(state="failed", error=str(e))
+            return
+
+        ml_models[f"{kind}_model"] = model
+        ml_models[f"{kind}_tokenizer"] = tokenizer
+        status.update(state="ready", load_seconds=round(time.perf_counter() - started, 2))
+
+def load_models():
+    """Load both models concurrently and wait for them."""
+    with ThreadPoolExecutor(max_workers=len(MODEL_PATHS)) as pool:
+        list(pool.map(load_model, MODEL_PATHS))
+
+def start_loading_models():
+    """Start loading both models in the background, unless loading is lazy."""
+    if LAZY_MODEL_LOADING:
+        return
+    for kind in MODEL_PATHS:
+        threading.Thread(target=load_model, args=(kind,), name=f"load-{kind}-model", daemon=True).start()
+
+def ensure_model_loaded(kind: str):
+    if model_status[kind]["state"] != "ready":
+        load_model(kind)
+    if model_status[kind]["state"] != "ready":
+        raise ModelNotReadyError(f"The {kind} model is not available: {model_status[kind]['error']}")
 
 def get_model(name: str):
-    return ml_models.get(name)
+    model = ml_models.get(name)
+    if model is None:
+        kind = name.rsplit("_", 1)[0]
+        if kind in MODEL_PATHS:
+            ensure_model_loaded(kind)
+            model = ml_models.get(name)
+    return model
+
+def get_model_status() -> dict:
+    return {kind: dict(status) for kind, status in model_status.items()}
+
+def artifacts_missing() -> bool:
+    """Whether loading the models would write shared artifacts: MODEL_DIR copies or ONNX exports."""
+    for kind in MODEL_PATHS:
+        if MODEL_DIR and not _resolve_source(kind)[1]:
+            return True
+        if INFERENCE_BACKEND == "onnx":
+            from api.utils.onnx_backend import onnx_model_path
+            if not os.path.exists(onnx_model_path(kind, MODEL_PATHS[kind])):
+                return True
+    return False
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def get_model_revision(kind: str):
+    """
+    Which weights `kind` resolves to: a digest of the local weights file, or
+    the hub commit of the cached checkpoint. None until the files exist
+    (e.g. while workers are still downloading them); known values are kept
+    for the life of the process, like the loaded models.
+    """
+    if kind in _revisions:
+        return _revisions[kind]
+    revision = None
+    for local_dir in (_artifact_dir(kind), MODEL_PATHS[kind]):
+        if local_dir and os.path.isdir(local_dir):
+            weights = [os.path.join(local_dir, name) for name in TF_WEIGHTS_FILES]
+            weights = [path for path in weights if os.path.exists(path)]
+            if weights:
+                revision = f"sha256:{_file_digest(weights[0])}"
+                break
+    if revision is None:
+        try:
+            from huggingface_hub import try_to_load_from_cache
+            # cached files live at .../snapshots/<commit>/config.json
+            cached = try_to_load_from_cache(MODEL_PATHS[kind], "config.json")
+            if isinstance(cached, str):
+                revision = os.path.basename(os.path.dirname(cached))
+        except Exception as e:
+            logging.debug(f"Could not resolve the {kind} model revision: {e}")
+    if revision is not None:
+        _revisions[kind] = revision
+    return revision
+
+def get_model_id(kind: str) -> str:
+    """
+    Identifies the weights and the settings that shape a model's output, so
+    cached predictions can be tied to them.
+    """
+    from api.utils import inference
+
+    if INFERENCE_BACKEND == "onnx":
+        from api.utils.onnx_backend import ONNX_QUANTIZE
+        model_id = f"onnx{'-int8' if ONNX_QUANTIZE else ''}:{MODEL_PATHS[kind]}"
+    else:
+        model_id = MODEL_PATHS[kind]
+    model_id += f"@{get_model_revision(kind)}"
+    if inference.LONG_DOCUMENTS:
+        model_id += (
+            f"|windows={inference.MAX_WINDOWS},overlap={inference.WINDOW_OVERLAP},"
+            f"reducer={inference.WINDOW_REDUCER}"
+        )
+    return model_id
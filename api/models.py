@@ -15,6 +15,8 @@ class Profile(Base):
     crawling_state = Column(String, nullable=False, default="not_started")
     last_crawled = Column(DateTime, nullable=True)                 
     is_active = Column(Boolean, default=True)
+    js_rendered = Column(Boolean, nullable=True)  # New: front page needs the browser for link discovery (unknown until first crawl)
+    extractor_chain = Column(String, nullable=True)  # New: comma-separated article extractors, e.g. "trafilatura,unstructured"
 
     articles = relationship("Article", back_populates="source", cascade="all, delete")
 
@@ -45,5 +47,6 @@ class Article(Base):
     is_featured = Column(Boolean, default=False)   # New: highlight special articles
     is_reported = Column(Boolean, default=False)   # New: user can report article if it's misinformation
     reported_reason = Column(Text, nullable=True)  # Optional reason provided by the user when reported
+    cluster_id = Column(Integer, nullable=True, index=True)  # New: id of the first article of the story this one nearly duplicates (its own id if none)
 
     source = relationship("Profile", back_populates="articles")
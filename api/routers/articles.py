@@ -3,10 +3,14 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 import logging
 from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 
 from api.database import get_db
 from api.models import Article, Profile
 from api.schemas import ArticleCreate, ArticleOut
+from api.utils.near_duplicates import cluster_of, near_duplicates
+from api.utils.url_canonical import canonicalize
+from api.utils.url_filter import seen_urls
 from typing import List, Optional
 
 logger = logging.getLogger(__name__)
@@ -16,7 +20,8 @@ router = APIRouter()
 
 @router.post("/", response_model=ArticleOut)
 def create_article(article: ArticleCreate, db: Session = Depends(get_db)):
-    existing = db.query(Article).filter(Article.url == article.url).first()
+    submitted_url, article.url = article.url, canonicalize(article.url)
+    existing = db.query(Article).filter(Article.url.in_({article.url, submitted_url})).first()
     if existing:
         raise HTTPException(status_code=400, detail="Article with this URL already exists")
 
@@ -24,10 +29,21 @@ def create_article(article: ArticleCreate, db: Session = Depends(get_db)):
     if not profile:
         raise HTTPException(status_code=404, detail="Associated profile not found")
 
+    # manually created articles keep their own scores but join their story's cluster
+    signature, duplicate = near_duplicates.match_stored(db, [article.content])[0]
     new_article = Article(**article.dict())
-    db.add(new_article)
-    db.commit()
+    try:
+        db.add(new_article)
+        db.flush()
+        if new_article.cluster_id is None:
+            new_article.cluster_id = cluster_of(new_article, duplicate)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Article with this URL already exists")
     db.refresh(new_article)
+    seen_urls.add(new_article.url)
+    near_duplicates.add(new_article.id, new_article.cluster_id, signature)
     return new_article
 
 def split_filter_list(values: Optional[List[str]]) -> List[str]:
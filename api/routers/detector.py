@@ -5,6 +5,7 @@ from fastapi.responses import JSONResponse
 from urllib.parse import urlparse
 
 from api.database import get_db
+from api.ml_models import ModelNotReadyError
 from api.utils.single_article_extractor import SingleArticleExtractor
 
 # Configure logging
@@ -35,7 +36,11 @@ def detect_sentiment(data: dict, db: Session = Depends(get_db)):
     
     # send the url to the business logic
     extractor = SingleArticleExtractor(db=db)
-    article = extractor.process(url)
+    try:
+        article = extractor.process(url)
+    except ModelNotReadyError as e:
+        logger.error(f"Models not ready for {url}: {e}")
+        return JSONResponse(content={"error": "Models are not ready, try again later"}, status_code=503)
     if not article:
         return JSONResponse(content={"error": "Failed to process URL"}, status_code=500)
     return JSONResponse(content=article, status_code=200)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from api.ml_models import LAZY_MODEL_LOADING, get_model_status
+from api.utils import inference_workers
+
+router = APIRouter()
+
+
+@router.get("/ready", response_class=JSONResponse)
+def readiness():
+    if inference_workers.enabled():
+        workers = inference_workers.get_pool_status()
+        return JSONResponse(content={"ready": workers["ready"], "workers": workers}, status_code=200 if workers["ready"] else 503)
+
+    models = get_model_status()
+    if LAZY_MODEL_LOADING:
+        # lazily loaded models are fetched on first use, only a failed load makes us unready
+        ready = all(status["state"] != "failed" for status in models.values())
+    else:
+        ready = all(status["state"] == "ready" for status in models.values())
+    return JSONResponse(content={"ready": ready, "models": models}, status_code=200 if ready else 503)
@@ -0,0 +1,62 @@
+from fastapi import APIRouter
+
+from api.utils import cascade, extraction, inference
+from api.utils.browser_pool import browser_pool
+from api.utils.fetcher import fetcher
+from api.utils.host_scheduler import host_scheduler
+from api.utils.html_archive import html_archive
+from api.utils.link_scoring import link_scorer
+from api.utils.near_duplicates import near_duplicates
+from api.utils.url_filter import seen_urls
+
+router = APIRouter()
+
+
+@router.get("/inference")
+def inference_metrics():
+    return inference.get_stats()
+
+
+@router.get("/cascade")
+def cascade_metrics():
+    return cascade.get_stats()
+
+
+@router.get("/fetcher")
+def fetcher_metrics():
+    return fetcher.get_stats()
+
+
+@router.get("/hosts")
+def host_metrics():
+    return host_scheduler.get_stats()
+
+
+@router.get("/seen-urls")
+def seen_url_metrics():
+    return seen_urls.get_stats()
+
+
+@router.get("/links")
+def link_metrics():
+    return link_scorer.get_stats()
+
+
+@router.get("/browsers")
+def browser_metrics():
+    return browser_pool.get_stats()
+
+
+@router.get("/extraction")
+def extraction_metrics():
+    return extraction.get_stats()
+
+
+@router.get("/archive")
+def archive_metrics():
+    return html_archive.get_stats() if html_archive else {"enabled": False}
+
+
+@router.get("/near-duplicates")
+def near_duplicate_metrics():
+    return near_duplicates.get_stats()
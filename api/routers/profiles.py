@@ -106,7 +106,7 @@ async def trigger_crawl(profile_name: str, request: Request, background_tasks: B
 
     # Run the pipeline in a background task
     pipeline = Crawl4AIPipelineSingleProfile(db=db, profile=profile)
-    background_tasks.add_task(run_crawler_background, pipeline, request.app.state.crawler)
+    background_tasks.add_task(run_crawler_background, pipeline)
 
     return {"message": f"Crawl triggered for profile '{profile_name}'."}
 
@@ -152,7 +152,7 @@ def get_profile_analytics(profile_id: str, db: Session = Depends(get_db)):
     }
 
 
-def run_crawler_background(pipeline, crawler):
+def run_crawler_background(pipeline):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(pipeline.run(crawler=crawler))
\ No newline at end of file
+    loop.run_until_complete(pipeline.run())
\ No newline at end of file
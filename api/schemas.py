@@ -12,6 +12,8 @@ class ProfileBase(BaseModel):
     crawling_strategy: str
     crawling_state: str = "not_started"
     is_active: bool = True
+    js_rendered: Optional[bool] = None
+    extractor_chain: Optional[str] = None
 
 
 class ProfileCreate(ProfileBase):
@@ -45,6 +47,7 @@ class ArticleBase(BaseModel):
     is_featured: bool = False
     is_reported: bool = False
     reported_reason: Optional[str] = None
+    cluster_id: Optional[int] = None
 
 
 class ArticleCreate(ArticleBase):
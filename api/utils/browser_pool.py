@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+
+logger = logging.getLogger(__name__)
+
+BROWSER_INSTANCES = int(os.getenv("BROWSER_INSTANCES", "1"))
+BROWSER_PAGES_PER_INSTANCE = int(os.getenv("BROWSER_PAGES_PER_INSTANCE", "4"))
+# Restart a browser after this many navigations to shed leaked memory
+BROWSER_MAX_NAVIGATIONS = int(os.getenv("BROWSER_MAX_NAVIGATIONS", "200"))
+BROWSER_MAX_ERRORS = int(os.getenv("BROWSER_MAX_ERRORS", "3"))
+BROWSER_HEALTH_INTERVAL = float(os.getenv("BROWSER_HEALTH_INTERVAL", "60"))
+# Close browsers idle for this long; they are started again on the next navigation
+BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+
+# Lean navigation: images, media, fonts, styles and ad/tracker hosts are
+# aborted, and anchors are read from DOMContentLoaded on
+BROWSER_BLOCK_RESOURCES = set(
+    os.getenv("BROWSER_BLOCK_RESOURCES", "image,media,font,stylesheet,texttrack,eventsource,websocket,manifest").split(",")
+)
+BROWSER_BLOCK_DOMAINS = [
+    domain.strip().lower() for domain in os.getenv(
+        "BROWSER_BLOCK_DOMAINS",
+        "doubleclick.net,googlesyndication.com,googleadservices.com,google-analytics.com,"
+        "googletagmanager.com,googletagservices.com,adservice.google.com,amazon-adsystem.com,"
+        "facebook.net,connect.facebook.net,scorecardresearch.com,taboola.com,outbrain.com,"
+        "criteo.com,criteo.net,chartbeat.com,chartbeat.net,hotjar.com,quantserve.com,"
+        "moatads.com,adnxs.com,pubmatic.com,rubiconproject.com,izooto.com,onesignal.com",
+    ).split(",") if domain.strip()
+]
+BROWSER_WAIT_UNTIL = os.getenv("BROWSER_WAIT_UNTIL", "domcontentloaded")
+# Navigation timeout in seconds; a page is abandoned outright after twice this
+BROWSER_PAGE_TIMEOUT = float(os.getenv("BROWSER_PAGE_TIMEOUT", "15"))
+
+HEALTH_CHECK_URL = "raw:<html><body>ok</body></html>"
+
+
+class PooledBrowser:
+    def __init__(self):
+        self.crawler = None
+        self.starting = asyncio.Lock()
+        self.active = 0
+        self.navigations = 0
+        self.errors = 0
+        self.last_used = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Headless browsers shared by the scheduler, the crawl triggers and the
+    pipelines. Browsers start on first use, serve up to
+    BROWSER_PAGES_PER_INSTANCE concurrent pages each, and are replaced after
+    BROWSER_MAX_NAVIGATIONS navigations, repeated errors or a failed health
+    check. Pages load lean: non-document resources and ad/tracker domains
+    are aborted, and navigation waits for DOMContentLoaded under a hard
+    time budget. Like the fetcher, the pool lives on its own event loop
+    thread so callers on any loop can borrow from it.
+    """
+
+    def __init__(self, instances: int = BROWSER_INSTANCES, pages_per_instance: int = BROWSER_PAGES_PER_INSTANCE):
+        self.instances = instances
+        self.pages_per_instance = pages_per_instance
+        self._loop = None
+        self._browsers = []
+        self._slots = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "navigations": 0, "failures": 0, "timeouts": 0, "starts": 0, "recycled": 0,
+            "idle_closed": 0, "blocked_requests": 0,
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="browser-pool-loop", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+            self._loop = loop
+
+    async def _open(self):
+        self._browsers = [PooledBrowser() for _ in range(self.instances)]
+        self._slots = asyncio.Semaphore(self.instances * self.pages_per_instance)
+        asyncio.get_running_loop().create_task(self._maintain())
+
+    async def _start(self, browser: PooledBrowser):
+        async with browser.starting:
+            if browser.crawler is None:
+                crawler = AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False))
+                crawler.crawler_strategy.set_hook("on_page_context_created", self._block_resources)
+                await crawler.start()
+                browser.crawler = crawler
+                self.stats["starts"] += 1
+        return browser.crawler
+
+    def _blocked(self, request) -> bool:
+        if request.resource_type in BROWSER_BLOCK_RESOURCES:
+            return True
+        host = (urlsplit(request.url).hostname or "").lower()
+        return any(host == domain or host.endswith("." + domain) for domain in BROWSER_BLOCK_DOMAINS)
+
+    async def _route(self, route):
+        if self._blocked(route.request):
+            self.stats["blocked_requests"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _block_resources(self, page, context=None, **kwargs):
+        await page.route("**/*", self._route)
+        return page
+
+    async def _close(self, crawler: AsyncWebCrawler):
+        try:
+            await crawler.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {e}")
+
+    def _retire(self, browser: PooledBrowser, reason: str):
+        """Swap in a fresh slot; the old browser closes once its open pages finish."""
+        index = self._browsers.index(browser)
+        self._browsers[index] = PooledBrowser()
+        self.stats["recycled"] += 1
+        logger.info(f"Recycling browser {index}: {reason}")
+        if browser.active == 0 and browser.crawler is not None:
+            asyncio.get_running_loop().create_task(self._close(browser.crawler))
+
+    async def _arun(self, url: str, **kwargs):
+        async with self._slots:
+            browser = min(self._browsers, key=lambda b: b.active)
+            browser.active += 1
+            try:
+                crawler = await self._start(browser)
+                kwargs.setdefault("config", CrawlerRunConfig(
+                    wait_until=BROWSER_WAIT_UNTIL, page_timeout=int(BROWSER_PAGE_TIMEOUT * 1000),
+                ))
+                try:
+                    # crawl4ai's page_timeout covers navigation only; this bounds the whole page
+                    result = await asyncio.wait_for(crawler.arun(url, **kwargs), timeout=BROWSER_PAGE_TIMEOUT * 2)
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    raise
+                browser.errors = 0 if result.success else browser.errors + 1
+                return result
+            except Exception:
+                browser.errors += 1
+                self.stats["failures"] += 1
+                raise
+            finally:
+                browser.active -= 1
+                browser.navigations += 1
+                browser.last_used = time.monotonic()
+                self.stats["navigations"] += 1
+                if browser in self._browsers:
+                    if browser.errors >= BROWSER_MAX_ERRORS:
+                        self._retire(browser, f"{browser.errors} consecutive errors")
+                    elif browser.navigations >= BROWSER_MAX_NAVIGATIONS:
+                        self._retire(browser, f"{browser.navigations} navigations")
+                elif browser.active == 0 and browser.crawler is not None:
+                    await self._close(browser.crawler)
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(BROWSER_HEALTH_INTERVAL)
+            for browser in list(self._browsers):
+                if browser.crawler is None or browser.active:
+                    continue
+                if time.monotonic() - browser.last_used > BROWSER_IDLE_TIMEOUT:
+                    crawler, browser.crawler = browser.crawler, None
+                    self.stats["idle_closed"] += 1
+                    await self._close(crawler)
+                    continue
+                try:
+                    result = await asyncio.wait_for(browser.crawler.arun(HEALTH_CHECK_URL), timeout=30)
+                    healthy = result.success
+                except Exception as e:
+                    logger.warning(f"Browser health check failed: {e}")
+                    healthy = False
+                if not healthy and browser in self._browsers:
+                    self._retire(browser, "failed health check")
+
+    async def arun(self, url: str, **kwargs):
+        """Navigate to `url` with a pooled browser; same arguments and result as AsyncWebCrawler.arun."""
+        self._ensure_started()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._arun(url, **kwargs), self._loop))
+
+    def get_stats(self) -> dict:
+        browsers = list(self._browsers)
+        return dict(
+            self.stats,
+            instances=[
+                {
+                    "running": browser.crawler is not None,
+                    "active_pages": browser.active,
+                    "navigations": browser.navigations,
+                    "consecutive_errors": browser.errors,
+                }
+                for browser in browsers
+            ],
+        )
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+
+            async def close_all():
+                for browser in self._browsers:
+                    if browser.crawler is not None:
+                        await self._close(browser.crawler)
+
+            asyncio.run_coroutine_threadsafe(close_all(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,238 @@
+"""
+Cheap first stage in front of the transformers: a hashed word n-gram
+linear model per task answers confident articles directly and defers the
+rest to the transformer. Models are trained offline from the labelled
+articles table:
+
+    python -m api.utils.cascade train
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import zlib
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+CASCADE_MODEL_DIR = os.getenv("CASCADE_MODEL_DIR", "cascade_models")
+# Minimum top-class probability for the cheap model to answer on its own
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+# Share of confident answers also sent to the transformer to measure agreement
+CASCADE_AUDIT_RATE = float(os.getenv("CASCADE_AUDIT_RATE", "0.05"))
+N_FEATURES = 2 ** 18
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def hash_features(text: str, n_features: int = N_FEATURES):
+    """Hashed unigram + bigram counts, log-scaled and L2-normalized, as (indices, values)."""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    counts = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % n_features
+        counts[index] = counts.get(index, 0) + 1
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return indices, values
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max())
+    return exp / exp.sum()
+
+
+class HashedNgramClassifier:
+    """Multinomial logistic regression over hashed n-gram features."""
+
+    def __init__(self, labels: list, n_features: int = N_FEATURES):
+        self.labels = list(labels)
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = hash_features(text, self.n_features)
+        return _softmax(values @ self.weights[indices] + self.bias)
+
+    def fit(self, texts: list, labels: list, epochs: int = 5, learning_rate: float = 0.5, l2: float = 1e-6, seed: int = 0):
+        features = [hash_features(text, self.n_features) for text in texts]
+        targets = [self.labels.index(label) for label in labels]
+        rng = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch)
+            for i in rng.permutation(len(features)):
+                indices, values = features[i]
+                grad = _softmax(values @ self.weights[indices] + self.bias)
+                grad[targets[i]] -= 1
+                self.weights[indices] -= rate * (np.outer(values, grad) + l2 * self.weights[indices])
+                self.bias -= rate * grad
+        return self
+
+    def accuracy(self, texts: list, labels: list) -> float:
+        hits = sum(
+            self.labels[int(np.argmax(self.predict_proba(text)))] == label
+            for text, label in zip(texts, labels)
+        )
+        return hits / len(texts) if texts else 0.0
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, labels=np.array(self.labels))
+
+    @classmethod
+    def load(cls, path: str):
+        data = np.load(path)
+        classifier = cls([str(label) for label in data["labels"]], n_features=data["weights"].shape[0])
+        classifier.weights = data["weights"]
+        classifier.bias = data["bias"]
+        return classifier
+
+
+_classifiers = {}
+_classifiers_lock = threading.Lock()
+_stats_lock = threading.Lock()
+stats = {}
+
+
+def get_classifier(kind: str):
+    if not CASCADE_ENABLED:
+        return None
+    with _classifiers_lock:
+        if kind not in _classifiers:
+            path = os.path.join(CASCADE_MODEL_DIR, f"{kind}.npz")
+            if os.path.exists(path):
+                _classifiers[kind] = HashedNgramClassifier.load(path)
+                logger.info(f"Loaded {kind} cascade model from {path}")
+            else:
+                logger.warning(f"No {kind} cascade model at {path}, every article goes to the transformer")
+                _classifiers[kind] = None
+        return _classifiers[kind]
+
+
+def _count(kind: str, **increments):
+    with _stats_lock:
+        counters = stats.setdefault(kind, {
+            "seen": 0, "answered": 0, "deferred": 0,
+            "audited": 0, "audit_agreed": 0, "deferred_compared": 0, "deferred_agreed": 0,
+        })
+        for name, value in increments.items():
+            counters[name] += value
+
+
+def _compare(kind: str, cheap_probs: np.ndarray, transformer: Future, prefix: str):
+    if transformer.exception() is not None:
+        return
+    agreed = int(np.argmax(cheap_probs)) == int(np.argmax(transformer.result()))
+    if prefix == "audit":
+        _count(kind, audited=1, audit_agreed=int(agreed))
+    else:
+        _count(kind, deferred_compared=1, deferred_agreed=int(agreed))
+
+
+def predict(kind: str, text: str, submit) -> Future:
+    """
+    Return a future of class probabilities for `text`. `submit` sends a text
+    to the transformer and is only called when the cheap model is unsure
+    (or when its confident answer is sampled for an agreement audit).
+    """
+    classifier = get_classifier(kind)
+    if classifier is None:
+        return submit(text)
+
+    probs = classifier.predict_proba(text)
+    if probs.max() < CASCADE_THRESHOLD:
+        _count(kind, seen=1, deferred=1)
+        future = submit(text)
+        future.add_done_callback(lambda f: _compare(kind, probs, f, "deferred"))
+        return future
+
+    _count(kind, seen=1, answered=1)
+    if random.random() < CASCADE_AUDIT_RATE:
+        submit(text).add_done_callback(lambda f: _compare(kind, probs, f, "audit"))
+    future = Future()
+    future.set_result(probs)
+    return future
+
+
+def get_stats() -> dict:
+    report = {"enabled": CASCADE_ENABLED, "threshold": CASCADE_THRESHOLD, "models": {}}
+    with _stats_lock:
+        for kind, counters in stats.items():
+            report["models"][kind] = dict(
+                counters,
+                deferral_rate=counters["deferred"] / counters["seen"] if counters["seen"] else None,
+                audit_agreement=counters["audit_agreed"] / counters["audited"] if counters["audited"] else None,
+                deferred_agreement=(
+                    counters["deferred_agreed"] / counters["deferred_compared"]
+                    if counters["deferred_compared"] else None
+                ),
+            )
+    return report
+
+
+def _load_training_data(kind: str, labels: list) -> tuple:
+    from api.database import SessionLocal
+    from api.models import Article
+
+    column = Article.classification if kind == "news" else Article.sentiment
+    canonical = {label.lower(): label for label in labels}
+    texts, targets = [], []
+    db = SessionLocal()
+    try:
+        for content, label in db.query(Article.content, column).yield_per(500):
+            label = canonical.get((label or "").lower())
+            if content and label:
+                texts.append(content)
+                targets.append(label)
+    finally:
+        db.close()
+    return texts, targets
+
+
+def train(output_dir: str = CASCADE_MODEL_DIR, epochs: int = 5, holdout: float = 0.1):
+    from api.utils.inference import CATEGORY_LABELS, SENTIMENT_LABELS
+
+    for kind, labels in (("news", CATEGORY_LABELS), ("sentiment", SENTIMENT_LABELS)):
+        texts, targets = _load_training_data(kind, labels)
+        if not texts:
+            print(f"{kind}: no labelled articles, skipping")
+            continue
+
+        order = np.random.default_rng(0).permutation(len(texts))
+        split = int(len(texts) * (1 - holdout))
+        train_idx, test_idx = order[:split], order[split:]
+        classifier = HashedNgramClassifier(labels).fit(
+            [texts[i] for i in train_idx], [targets[i] for i in train_idx], epochs=epochs
+        )
+        accuracy = classifier.accuracy([texts[i] for i in test_idx], [targets[i] for i in test_idx])
+        path = os.path.join(output_dir, f"{kind}.npz")
+        classifier.save(path)
+        print(f"{kind}: trained on {len(train_idx)} articles, holdout accuracy {accuracy:.3f}, saved to {path}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Train the cascade classifiers from stored articles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_parser = sub.add_parser("train")
+    train_parser.add_argument("--output", default=CASCADE_MODEL_DIR)
+    train_parser.add_argument("--epochs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    train(args.output, epochs=args.epochs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import logging
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledClassifier:
+    """
+    Wraps a TF sequence classifier in one graph function per padded sequence
+    length. Inputs padded to one of `fixed_lengths` run the traced graph;
+    any other shape falls back to the eager model.
+    """
+
+    def __init__(self, model, fixed_lengths: list):
+        import tensorflow as tf
+
+        self.model = model
+        self.fixed_lengths = sorted(fixed_lengths)
+        self._functions = {
+            length: tf.function(
+                self._logits,
+                input_signature=[
+                    tf.TensorSpec((None, length), tf.int32, name="input_ids"),
+                    tf.TensorSpec((None, length), tf.int32, name="attention_mask"),
+                ],
+            )
+            for length in self.fixed_lengths
+        }
+
+    def _logits(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, training=False).logits
+
+    def __call__(self, inputs: dict, **kwargs):
+        function = self._functions.get(np.shape(inputs["input_ids"])[1])
+        if function is None:
+            return self.model(inputs, **kwargs)
+        logits = function(
+            np.asarray(inputs["input_ids"], dtype=np.int32),
+            np.asarray(inputs["attention_mask"], dtype=np.int32),
+        )
+        return SimpleNamespace(logits=logits.numpy())
+
+    def warmup(self, batch_sizes: list) -> dict:
+        """
+        Trace and run every fixed shape once per batch size. Returns the
+        seconds spent compiling (first call per length) and warming up.
+        """
+        timings = {"compile_seconds": 0.0, "warmup_seconds": 0.0}
+        for length in self.fixed_lengths:
+            for i, batch_size in enumerate(batch_sizes):
+                dummy = {
+                    "input_ids": np.zeros((batch_size, length), dtype=np.int32),
+                    "attention_mask": np.ones((batch_size, length), dtype=np.int32),
+                }
+                started = time.perf_counter()
+                self(dummy)
+                key = "compile_seconds" if i == 0 else "warmup_seconds"
+                timings[key] += time.perf_counter() - started
+        return {key: round(value, 2) for key, value in timings.items()}
+
+
+def compile_classifier(kind: str, model):
+    from api.utils.inference import BUCKET_EDGES, MAX_BATCH_SIZE
+
+    compiled = CompiledClassifier(model, BUCKET_EDGES)
+    timings = compiled.warmup([1, MAX_BATCH_SIZE])
+    logger.info(
+        f"Compiled {kind} model for lengths {compiled.fixed_lengths}: "
+        f"{timings['compile_seconds']}s compile, {timings['warmup_seconds']}s warmup"
+    )
+    return compiled, timings
@@ -0,0 +1,257 @@
+import logging
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+
+from sqlalchemy.orm import object_session
+
+from api.models import Profile
+from api.utils.link_discovery import LINK_DISCOVERY_MIN_LINKS, extract_all_urls, extract_http_urls, fetch_page
+from api.utils.url_canonical import head_links
+
+logger = logging.getLogger(__name__)
+
+# Strategy for profiles whose crawling_strategy is not one of STRATEGIES (e.g. 'custom')
+DEFAULT_CRAWL_STRATEGY = os.getenv("DEFAULT_CRAWL_STRATEGY", "auto")
+FEED_MAX_ENTRIES = int(os.getenv("FEED_MAX_ENTRIES", "500"))
+FEED_MAX_SITEMAPS = int(os.getenv("FEED_MAX_SITEMAPS", "5"))
+
+# JSON Feed is not listed: parse_feed only reads RSS and Atom
+FEED_TYPES = {"application/rss+xml", "application/atom+xml"}
+
+
+def _tag(element) -> str:
+    return element.tag.rsplit("}", 1)[-1].lower()
+
+
+def _child_text(element, *names):
+    for child in element:
+        if _tag(child) in names and (child.text or "").strip():
+            return child.text.strip()
+    return None
+
+
+def parse_date(value: str):
+    """Feed or sitemap date as a naive UTC datetime, comparable with Profile.last_crawled."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value.strip())
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_xml(text: str):
+    try:
+        return ET.fromstring(text.lstrip().encode("utf-8"))
+    except ET.ParseError:
+        return None
+
+
+def parse_feed(text: str):
+    """(url, title, published) entries of an RSS or Atom document, or None if it is not a feed."""
+    root = _parse_xml(text)
+    if root is None or _tag(root) not in ("rss", "feed", "rdf"):
+        return None
+    entries = []
+    for element in root.iter():
+        if _tag(element) == "item":
+            # a guid is only a URL when it says so, and often is an opaque id
+            url = _child_text(element, "link")
+            guid = _child_text(element, "guid")
+            if not url and guid and guid.lower().startswith(("http://", "https://")):
+                url = guid
+            published = _child_text(element, "pubdate", "date", "updated")
+        elif _tag(element) == "entry":
+            links = [child for child in element if _tag(child) == "link"]
+            alternate = [link for link in links if link.get("rel", "alternate") == "alternate"] or links
+            url = alternate[0].get("href") if alternate else None
+            published = _child_text(element, "published", "updated")
+        else:
+            continue
+        if url:
+            entries.append((url.strip(), _child_text(element, "title") or "", parse_date(published)))
+    return entries
+
+
+def parse_sitemap(text: str):
+    """
+    ("urlset" | "sitemapindex", entries) for a sitemap, or None if the
+    document is not one. Entries are (url, title, lastmod); news sitemaps
+    provide the title and publication date.
+    """
+    root = _parse_xml(text)
+    if root is None or _tag(root) not in ("urlset", "sitemapindex"):
+        return None
+    entries = []
+    for element in root:
+        url = _child_text(element, "loc")
+        if not url:
+            continue
+        title, modified = "", _child_text(element, "lastmod")
+        for child in element:
+            if _tag(child) == "news":
+                title = _child_text(child, "title") or ""
+                modified = _child_text(child, "publication_date") or modified
+        entries.append((url, title, parse_date(modified)))
+    return _tag(root), entries
+
+
+def _links(entries: list, since) -> list:
+    """Link objects, shaped like the crawler's, for entries newer than `since`, newest first."""
+    fresh = [entry for entry in entries if since is None or entry[2] is None or entry[2] > since]
+    fresh.sort(key=lambda entry: entry[2] or datetime.min, reverse=True)
+    return [{"href": url, "text": title} for url, title, _ in fresh[:FEED_MAX_ENTRIES]]
+
+
+async def rss_links(profile: Profile):
+    """Entries of the profile's feed: base_url itself, or the feeds its page advertises."""
+    page = await fetch_page(profile.base_url)
+    if page is None:
+        return None
+    entries = parse_feed(page.text)
+    if entries is None:
+        feed_urls = [
+            urljoin(page.url, link["href"]) for link in head_links(page.text)
+            if link.get("type", "").lower() in FEED_TYPES and link.get("href")
+            and "alternate" in link.get("rel", "").lower().split()
+        ]
+        if not feed_urls:
+            return None
+        entries, parsed = [], False
+        for feed_url in feed_urls[:3]:
+            feed = await fetch_page(feed_url)
+            feed_entries = parse_feed(feed.text) if feed is not None else None
+            if feed_entries is not None:
+                parsed = True
+                entries.extend(feed_entries)
+        # advertised feeds that cannot be read are no feed at all; let the caller fall back
+        if not parsed:
+            return None
+    return _links(entries, profile.last_crawled)
+
+
+async def _sitemap_urls(base_url: str) -> list:
+    if urlsplit(base_url).path.endswith(".xml"):
+        return [base_url]
+    origin = "{0.scheme}://{0.netloc}".format(urlsplit(base_url))
+    robots = await fetch_page(f"{origin}/robots.txt")
+    declared = []
+    if robots is not None:
+        declared = [
+            line.split(":", 1)[1].strip() for line in robots.text.splitlines()
+            if line.lower().startswith("sitemap:")
+        ]
+    # news sitemaps list only recent articles, so they are read first
+    declared.sort(key=lambda url: "news" not in url.lower())
+    return declared or [f"{origin}/sitemap.xml"]
+
+
+async def sitemap_links(profile: Profile):
+    """Article URLs from the site's sitemaps, descending into indexes newest child first."""
+    since = profile.last_crawled
+    pending = await _sitemap_urls(profile.base_url)
+    entries, read, found = [], 0, False
+    while pending and read < FEED_MAX_SITEMAPS:
+        sitemap = await fetch_page(pending.pop(0))
+        read += 1
+        parsed = sitemap and parse_sitemap(sitemap.text)
+        if not parsed:
+            continue
+        found = True
+        kind, items = parsed
+        if kind == "urlset":
+            entries.extend(items)
+            continue
+        # only child sitemaps changed since the last crawl can hold new articles
+        children = [item for item in items if since is None or item[2] is None or item[2] > since]
+        children.sort(key=lambda item: (item[2] or datetime.min, "news" in item[0].lower()), reverse=True)
+        pending.extend(url for url, _, _ in children)
+    return _links(entries, since) if found else None
+
+
+async def browser_links(profile: Profile):
+    return await extract_all_urls(profile.base_url)
+
+
+def _record_js_rendered(profile: Profile, js_rendered: bool):
+    if profile.js_rendered == js_rendered:
+        return
+    profile.js_rendered = js_rendered
+    session = object_session(profile)
+    if session is not None:
+        session.commit()
+    logger.info(f"Profile {profile.name} {'needs' if js_rendered else 'does not need'} the browser for link discovery")
+
+
+async def page_links(profile: Profile):
+    """
+    Links of the profile's front page, read from its server-rendered HTML.
+    The page is rendered in the browser only when the HTML yields fewer
+    than LINK_DISCOVERY_MIN_LINKS links or the profile is known to be
+    JS-rendered; the outcome is recorded on the profile for the next crawl.
+    """
+    if profile.js_rendered:
+        return await browser_links(profile)
+
+    page = await fetch_page(profile.base_url)
+    links = await extract_http_urls(profile.base_url, page) if page is not None else []
+    if len(links) >= LINK_DISCOVERY_MIN_LINKS:
+        _record_js_rendered(profile, False)
+        return links
+
+    logger.info(f"Only {len(links)} links in the HTML of {profile.base_url}, rendering it in the browser")
+    try:
+        rendered = await extract_all_urls(profile.base_url, page)
+    except Exception as e:
+        # a timed-out or crashed render still leaves the links of the HTML
+        logger.warning(f"Rendering {profile.base_url} failed, using its {len(links)} HTML links: {e}")
+        return links
+    if len(rendered) > max(len(links), LINK_DISCOVERY_MIN_LINKS - 1):
+        _record_js_rendered(profile, True)
+    return rendered if len(rendered) >= len(links) else links
+
+
+async def auto_links(profile: Profile):
+    """Feeds first, then sitemaps, and the front page only for sites that publish neither."""
+    for strategy in (rss_links, sitemap_links):
+        links = await strategy(profile)
+        if links is not None:
+            return links
+    return await page_links(profile)
+
+
+STRATEGIES = {
+    "auto": auto_links,
+    "rss": rss_links,
+    "sitemap": sitemap_links,
+    "page": page_links,
+    "browser": browser_links,
+}
+
+
+async def discover_links(profile: Profile) -> list:
+    """
+    Candidate article links of a profile, found with the strategy named by
+    its crawling_strategy. Feed strategies only return entries published
+    or modified since profile.last_crawled; when a site turns out to have
+    no feed of the requested kind, its front page links are used instead.
+    """
+    name = (profile.crawling_strategy or "").lower()
+    if name not in STRATEGIES:
+        name = DEFAULT_CRAWL_STRATEGY
+    links = await STRATEGIES[name](profile)
+    if links is None:
+        logger.info(f"No {name} feed found for profile {profile.name}, reading links from {profile.base_url}")
+        links = await page_links(profile)
+    else:
+        logger.info(f"Discovered {len(links)} links for profile {profile.name} with the {name} strategy")
+    return links
@@ -0,0 +1,229 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Worker processes turning HTML into articles; 0 extracts in a thread of the API process
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "30"))  # seconds per document
+EXTRACTION_MAX_BYTES = int(os.getenv("EXTRACTION_MAX_BYTES", str(5 * 1024 * 1024)))
+# Extractors tried in order until one yields enough text; profiles can override it
+EXTRACTOR_CHAIN = os.getenv("EXTRACTOR_CHAIN", "trafilatura,unstructured")
+EXTRACTION_MIN_CHARS = int(os.getenv("EXTRACTION_MIN_CHARS", "1000"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+stats = {"documents": 0, "extracted": 0, "oversized": 0, "timeouts": 0, "failures": 0, "seconds": 0.0}
+extractor_counts = {}
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _init_worker():
+    # import the extractors once per worker instead of on its first document
+    import trafilatura  # noqa: F401
+    import unstructured.partition.html  # noqa: F401
+    signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def extract_with_trafilatura(html) -> dict:
+    """Fast path: trafilatura's main-text extraction on an lxml tree."""
+    import trafilatura
+
+    result = trafilatura.bare_extraction(html, include_comments=False, include_tables=False)
+    if result is None:
+        return {"title": "", "content": ""}
+    if not isinstance(result, dict):
+        result = result.as_dict()  # trafilatura >= 2.0 returns a Document
+    return {"title": (result.get("title") or "").strip(), "content": (result.get("text") or "").strip()}
+
+
+def extract_with_unstructured(html) -> dict:
+    """Slow path: unstructured's element partitioning, keeping the first title and the narrative text."""
+    from unstructured.documents.elements import NarrativeText, Title
+    from unstructured.partition.html import partition_html
+
+    if isinstance(html, bytes):
+        elements = partition_html(file=io.BytesIO(html))
+    else:
+        elements = partition_html(text=html)
+
+    title = ""
+    content_lines = []
+    for el in elements:
+        if isinstance(el, Title) and not title:
+            title = el.text
+        elif isinstance(el, NarrativeText):
+            content_lines.append(el.text)
+
+    return {"title": title.strip(), "content": "\n".join(content_lines).strip()}
+
+
+EXTRACTORS = {
+    "trafilatura": extract_with_trafilatura,
+    "unstructured": extract_with_unstructured,
+}
+
+
+def parse_chain(chain: str = None) -> list:
+    """Extractor names of a comma-separated chain, falling back to EXTRACTOR_CHAIN."""
+    names = [name.strip().lower() for name in (chain or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in EXTRACTORS]
+    if unknown:
+        logger.warning(f"Ignoring unknown extractors {unknown}")
+    names = [name for name in names if name in EXTRACTORS]
+    default = [name.strip() for name in EXTRACTOR_CHAIN.split(",") if name.strip() in EXTRACTORS]
+    return names or default or ["unstructured"]
+
+
+def extract_article_html(html, chain: list = None, timeout: float = EXTRACTION_TIMEOUT):
+    """
+    Title and body text of an article page, from raw HTML bytes or text.
+    Each extractor of the chain is tried in turn until one yields a title
+    and EXTRACTION_MIN_CHARS of text; otherwise the longest result wins.
+    Runs inside an extraction worker, where SIGALRM bounds each document.
+    """
+    # only workers install the handler; elsewhere SIGALRM would kill the process
+    use_alarm = (
+        timeout and threading.current_thread() is threading.main_thread()
+        and signal.getsignal(signal.SIGALRM) is _on_alarm
+    )
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        best = None
+        for name in chain or parse_chain():
+            article = EXTRACTORS[name](html)
+            article["extractor"] = name
+            if article["title"] and len(article["content"]) >= EXTRACTION_MIN_CHARS:
+                return article
+            if best is None or len(article["content"]) > len(best["content"]):
+                best = article
+        return best
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _submit(html, chain: list) -> Future:
+    return get_pool().submit(extract_article_html, html, chain)
+
+
+def _record(name: str, started: float = None):
+    with _stats_lock:
+        stats[name] += 1
+        if started is not None:
+            stats["seconds"] += time.monotonic() - started
+
+
+def _too_large(html, url: str) -> bool:
+    _record("documents")
+    size = len(html) if isinstance(html, bytes) else len(html.encode("utf-8", errors="ignore"))
+    if size > EXTRACTION_MAX_BYTES:
+        logger.warning(f"Skipping extraction of {url}: {size} bytes exceeds {EXTRACTION_MAX_BYTES}")
+        _record("oversized")
+        return True
+    return False
+
+
+def _failed(e: Exception, url: str, started: float):
+    if isinstance(e, (ExtractionTimeout, asyncio.TimeoutError, TimeoutError)):
+        logger.warning(f"Extraction of {url} timed out after {EXTRACTION_TIMEOUT:.0f}s")
+        _record("timeouts", started)
+    else:
+        logger.error(f"Extraction of {url} failed: {e}")
+        _record("failures", started)
+        if isinstance(e, BrokenProcessPool):
+            _reset_pool()
+
+
+def _extracted(article: dict, started: float) -> dict:
+    _record("extracted", started)
+    with _stats_lock:
+        extractor_counts[article["extractor"]] = extractor_counts.get(article["extractor"], 0) + 1
+    return article
+
+
+def extract(html, url: str = "", chain: str = None):
+    """
+    Extract an article from a plain thread with the given extractor chain
+    (e.g. a profile's extractor_chain); returns None on oversized input,
+    timeout or failure.
+    """
+    if _too_large(html, url):
+        return None
+    started = time.monotonic()
+    try:
+        if EXTRACTION_WORKERS > 0:
+            # the worker's own alarm normally fires first; this covers a wedged worker
+            article = _submit(html, parse_chain(chain)).result(timeout=EXTRACTION_TIMEOUT + 5)
+        else:
+            article = extract_article_html(html, parse_chain(chain))
+    except Exception as e:
+        _failed(e, url, started)
+        return None
+    return _extracted(article, started)
+
+
+async def aextract(html, url: str = "", chain: str = None):
+    """Extract an article without blocking the event loop; same results as extract()."""
+    if _too_large(html, url):
+        return None
+    started = time.monotonic()
+    try:
+        if EXTRACTION_WORKERS > 0:
+            future = asyncio.wrap_future(_submit(html, parse_chain(chain)))
+            article = await asyncio.wait_for(future, timeout=EXTRACTION_TIMEOUT + 5)
+        else:
+            article = await asyncio.to_thread(extract_article_html, html, parse_chain(chain))
+    except Exception as e:
+        _failed(e, url, started)
+        return None
+    return _extracted(article, started)
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        return dict(
+            stats, by_extractor=dict(extractor_counts), chain=parse_chain(),
+            workers=EXTRACTION_WORKERS, max_bytes=EXTRACTION_MAX_BYTES, timeout=EXTRACTION_TIMEOUT,
+        )
+
+
+def shutdown_pool():
+    _reset_pool()
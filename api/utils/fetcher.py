@@ -0,0 +1,193 @@
+import asyncio
+import codecs
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+import httpx
+
+from api.utils.helpers import BROWSER_HEADERS
+from api.utils.host_scheduler import HostUnavailableError, host_scheduler
+from api.utils.http_cache import http_cache
+
+logger = logging.getLogger(__name__)
+
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "64"))
+FETCH_PER_HOST_CONNECTIONS = int(os.getenv("FETCH_PER_HOST_CONNECTIONS", "4"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "2"))
+RETRY_STATUSES = {500, 502, 503, 504}
+# Bodies are streamed and abandoned past this size
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+# Pages, feeds, sitemaps and robots.txt; anything else is refused from its headers
+FETCH_ALLOWED_TYPES = set(os.getenv(
+    "FETCH_ALLOWED_TYPES",
+    "text/html,application/xhtml+xml,application/xml,text/xml,application/rss+xml,application/atom+xml,text/plain",
+).split(","))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class FetchError(Exception):
+    pass
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int
+    text: str
+    headers: dict = field(default_factory=dict)
+    # True when the server answered 304 and `text` came from the page cache
+    not_modified: bool = False
+
+
+class AsyncFetcher:
+    """
+    Shared HTTP client for the crawl pipelines and the single article
+    extractor. It runs on its own event loop thread so every caller (the
+    app loop, scheduler threads, background tasks, sync request handlers)
+    shares one keep-alive connection pool and one set of concurrency limits.
+    """
+
+    def __init__(self, max_connections: int = FETCH_MAX_CONNECTIONS, per_host: int = FETCH_PER_HOST_CONNECTIONS):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self._loop = None
+        self._client = None
+        self._global_limit = None
+        self._host_limits = {}
+        self._lock = threading.Lock()
+        self.stats = {"fetched": 0, "not_modified": 0, "rejected_type": 0, "too_large": 0, "bytes": 0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="fetcher-loop", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+            self._loop = loop
+
+    async def _open(self):
+        # httpx negotiates encodings and connection reuse itself (Connection is illegal over HTTP/2)
+        headers = {k: v for k, v in BROWSER_HEADERS.items() if k not in ("Accept-Encoding", "Connection")}
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=FETCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+        self._global_limit = asyncio.Semaphore(self.max_connections)
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _read_body(self, url: str, response: httpx.Response) -> str:
+        """Stream and incrementally decode the body, refusing unwanted types and oversized pages early."""
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in FETCH_ALLOWED_TYPES:
+            self.stats["rejected_type"] += 1
+            raise FetchError(f"Skipping {url}: content type {content_type}")
+        declared = response.headers.get("Content-Length", "")
+        if declared.isdigit() and int(declared) > FETCH_MAX_BYTES:
+            self.stats["too_large"] += 1
+            raise FetchError(f"Skipping {url}: {declared} bytes exceeds {FETCH_MAX_BYTES}")
+
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        parts, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > FETCH_MAX_BYTES:
+                self.stats["too_large"] += 1
+                raise FetchError(f"Aborted {url} after {FETCH_MAX_BYTES} bytes")
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b"", final=True))
+        self.stats["bytes"] += size
+        return "".join(parts)
+
+    async def _get(self, url: str) -> FetchResult:
+        host = urlparse(url).netloc
+        cached = await asyncio.to_thread(http_cache.get, url) if http_cache else None
+        conditional = cached.validators() if cached else None
+        for attempt in range(FETCH_RETRIES + 1):
+            try:
+                await host_scheduler.acquire(host)
+            except HostUnavailableError as e:
+                raise FetchError(str(e)) from e
+
+            response, body = None, None
+            async with self._global_limit, self._host_limit(host):
+                started = time.monotonic()
+                try:
+                    async with self._client.stream("GET", url, headers=conditional) as response:
+                        host_scheduler.record(
+                            host, response.status_code, time.monotonic() - started,
+                            response.headers.get("Retry-After"),
+                        )
+                        # only successful bodies are read; others are dropped unread
+                        if 200 <= response.status_code < 300:
+                            body = await self._read_body(url, response)
+                except httpx.TransportError as e:
+                    host_scheduler.record(host)
+                    if attempt == FETCH_RETRIES:
+                        raise FetchError(f"Failed to fetch {url}: {e}") from e
+                    response = None
+                except (httpx.HTTPError, httpx.InvalidURL, UnicodeError) as e:
+                    # bad encodings, redirect loops and malformed URLs do not improve on retry
+                    raise FetchError(f"Failed to fetch {url}: {e}") from e
+
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt == FETCH_RETRIES):
+                break
+            await asyncio.sleep(0.3 * 2 ** attempt)
+
+        if response.status_code == 304 and cached:
+            http_cache.touch(url)
+            self.stats["not_modified"] += 1
+            return FetchResult(str(response.url), 200, cached.body, dict(response.headers), not_modified=True)
+        if response.status_code >= 300:
+            raise FetchError(f"Failed to fetch {url}: HTTP {response.status_code}")
+        self.stats["fetched"] += 1
+        if http_cache:
+            await asyncio.to_thread(http_cache.store, url, body, response.headers)
+        return FetchResult(str(response.url), response.status_code, body, dict(response.headers))
+
+    def submit(self, url: str) -> Future:
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._get(url), self._loop)
+
+    async def fetch(self, url: str) -> FetchResult:
+        """Fetch from any event loop without blocking it."""
+        return await asyncio.wrap_future(self.submit(url))
+
+    def fetch_sync(self, url: str) -> FetchResult:
+        """Fetch from a plain thread, e.g. a sync request handler."""
+        return self.submit(url).result()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, max_bytes=FETCH_MAX_BYTES)
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+fetcher = AsyncFetcher()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HOST_INITIAL_RATE = float(os.getenv("HOST_INITIAL_RATE", "2"))      # requests per second
+HOST_MIN_RATE = float(os.getenv("HOST_MIN_RATE", "0.1"))
+HOST_MAX_RATE = float(os.getenv("HOST_MAX_RATE", "10"))
+HOST_BURST = float(os.getenv("HOST_BURST", "4"))
+HOST_SLOW_LATENCY = float(os.getenv("HOST_SLOW_LATENCY", "3"))      # seconds
+BREAKER_FAILURES = int(os.getenv("HOST_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("HOST_BREAKER_COOLDOWN", "600"))  # seconds
+
+# Responses that mean the host is pushing back on us
+THROTTLE_STATUSES = {403, 429, 503}
+
+
+class HostUnavailableError(Exception):
+    pass
+
+
+class HostState:
+    def __init__(self):
+        self.rate = HOST_INITIAL_RATE
+        self.tokens = HOST_BURST
+        self.refilled_at = time.monotonic()
+        self.not_before = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.latency = None
+        self.counters = {"requests": 0, "successes": 0, "failures": 0, "throttled": 0, "circuit_opens": 0}
+
+    def refill(self, now: float):
+        self.tokens = min(HOST_BURST, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+
+class HostScheduler:
+    """
+    Per-host politeness for the crawl fetcher: a token bucket per host whose
+    rate grows additively while the host answers quickly and is halved on
+    throttling responses or slow answers, plus a circuit breaker that skips
+    a host for a cooldown window after repeated failures.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> HostState:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState()
+            return self._hosts[host]
+
+    def is_open(self, host: str) -> bool:
+        return self._state(host).open_until > time.monotonic()
+
+    async def acquire(self, host: str):
+        state = self._state(host)
+        while True:
+            now = time.monotonic()
+            if state.open_until > now:
+                raise HostUnavailableError(
+                    f"Circuit open for {host} for another {state.open_until - now:.0f}s"
+                )
+            state.refill(now)
+            if state.tokens >= 1 and now >= state.not_before:
+                state.tokens -= 1
+                state.counters["requests"] += 1
+                return
+            wait = max((1 - state.tokens) / state.rate, state.not_before - now)
+            await asyncio.sleep(wait)
+
+    def record(self, host: str, status_code: int = None, latency: float = None, retry_after: str = None):
+        """Feed back the outcome of a request; `status_code` is None for connection errors."""
+        state = self._state(host)
+        if status_code in THROTTLE_STATUSES:
+            state.counters["throttled"] += 1
+            state.rate = max(HOST_MIN_RATE, state.rate / 2)
+            if retry_after and retry_after.isdigit():
+                state.not_before = time.monotonic() + int(retry_after)
+            self._failed(host, state)
+        elif status_code is None or status_code >= 500:
+            self._failed(host, state)
+        else:
+            state.counters["successes"] += 1
+            state.consecutive_failures = 0
+            if latency is not None:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+                if latency > HOST_SLOW_LATENCY:
+                    state.rate = max(HOST_MIN_RATE, state.rate / 2)
+                else:
+                    state.rate = min(HOST_MAX_RATE, state.rate + 0.1)
+
+    def _failed(self, host: str, state: HostState):
+        state.counters["failures"] += 1
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= BREAKER_FAILURES:
+            state.open_until = time.monotonic() + BREAKER_COOLDOWN
+            state.counters["circuit_opens"] += 1
+            # half-open after the cooldown: a single further failure re-opens it
+            state.consecutive_failures = BREAKER_FAILURES - 1
+            logger.warning(f"Opening circuit for {host} for {BREAKER_COOLDOWN:.0f}s")
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            hosts = list(self._hosts.items())
+        return {
+            host: dict(
+                state.counters,
+                rate=round(state.rate, 3),
+                avg_latency=round(state.latency, 3) if state.latency is not None else None,
+                circuit="open" if state.open_until > now else "closed",
+                reopens_in=round(state.open_until - now) if state.open_until > now else None,
+            )
+            for host, state in sorted(hosts)
+        }
+
+
+host_scheduler = HostScheduler()
@@ -0,0 +1,221 @@
+"""
+Content-addressed archive of fetched article pages.
+
+Every downloaded page that passes the article check can be kept as a zstd-compressed
+blob named by the SHA-256 of its HTML, with a SQLite index of
+(url, fetched_at) -> blob. `reprocess` streams the latest capture of each
+stored article back through extraction and inference without touching the
+network, so new extraction rules or models can be applied to old articles:
+
+    python -m api.utils.html_archive reprocess --profile thehindu --batch-size 64
+    python -m api.utils.html_archive stats
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Directory of the archive; unset disables archiving
+HTML_ARCHIVE_DIR = os.getenv("HTML_ARCHIVE_DIR")
+HTML_ARCHIVE_LEVEL = int(os.getenv("HTML_ARCHIVE_LEVEL", "10"))
+
+
+class HtmlArchive:
+    def __init__(self, directory: str, level: int = HTML_ARCHIVE_LEVEL):
+        self.directory = directory
+        self.level = level
+        self._lock = threading.Lock()
+        self.stats = {"stored": 0, "deduplicated": 0, "raw_bytes": 0, "compressed_bytes": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT NOT NULL, fetched_at REAL NOT NULL, sha256 TEXT NOT NULL, fetched_url TEXT, "
+            "PRIMARY KEY (url, fetched_at))"
+        )
+        self._db.commit()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest + ".zst")
+
+    def store(self, url: str, html: str, fetched_url: str = None) -> str:
+        """Archive one capture of `url` and return its content hash."""
+        raw = html.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            compressed_size = 0
+            with self._lock:
+                self.stats["deduplicated"] += 1
+        else:
+            # compressor objects are not thread-safe, so each write gets its own
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(raw)
+            compressed_size = len(compressed)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, fetched_at, sha256, fetched_url) VALUES (?, ?, ?, ?)",
+                (url, time.time(), digest, fetched_url or url),
+            )
+            self._db.commit()
+            self.stats["stored"] += 1
+            self.stats["raw_bytes"] += len(raw)
+            self.stats["compressed_bytes"] += compressed_size
+        return digest
+
+    def load(self, digest: str) -> str:
+        with open(self._blob_path(digest), "rb") as f:
+            return zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+
+    def latest(self, since: float = None) -> list:
+        """(url, fetched_at, sha256) of the newest capture of each URL, optionally only recent ones."""
+        # SQLite takes the bare sha256 column from the row holding MAX(fetched_at)
+        query = "SELECT url, MAX(fetched_at), sha256 FROM pages"
+        params = []
+        if since is not None:
+            query += " WHERE fetched_at >= ?"
+            params.append(since)
+        query += " GROUP BY url ORDER BY url"
+        with self._lock:
+            return self._db.execute(query, params).fetchall()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            pages, urls = self._db.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM pages").fetchone()
+            return dict(self.stats, captures=pages, urls=urls, directory=self.directory)
+
+
+html_archive = None
+if HTML_ARCHIVE_DIR:
+    if ZSTD_AVAILABLE:
+        html_archive = HtmlArchive(HTML_ARCHIVE_DIR)
+    else:
+        logger.error("HTML_ARCHIVE_DIR is set but zstandard is not installed; pages will not be archived")
+
+
+async def _reextract(archive: HtmlArchive, digest: str, url: str, chain: str):
+    """Extraction result of one archived page, or None when its blob is missing, corrupt or unusable."""
+    from api.utils import extraction
+
+    try:
+        html = await asyncio.to_thread(archive.load, digest)
+    except (OSError, UnicodeDecodeError, zstandard.ZstdError) as e:
+        logger.error(f"Cannot read the archived page of {url} ({digest}): {e}")
+        return None
+    return await extraction.aextract(html, url, chain)
+
+
+async def reprocess(archive: HtmlArchive, profile_name: str = None, since: float = None,
+                    batch_size: int = 64, dry_run: bool = False) -> dict:
+    """Re-extract and re-score stored articles from their archived pages."""
+    from api.database import SessionLocal
+    from api.models import Article, Profile
+    from api.utils import inference
+
+    counts = {"archived": 0, "updated": 0, "not_stored": 0, "extraction_failed": 0}
+    db = SessionLocal()
+    try:
+        profiles = {profile.id: profile for profile in db.query(Profile).all()}
+        rows = archive.latest(since=since)
+        counts["archived"] = len(rows)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            articles = {
+                article.url: article
+                for article in db.query(Article).filter(Article.url.in_([url for url, _, _ in batch])).all()
+            }
+            pending = []
+            for url, _, digest in batch:
+                article = articles.get(url)
+                if article is None:
+                    counts["not_stored"] += 1
+                    continue
+                profile = profiles.get(article.source_id)
+                if profile_name and (profile is None or profile.name != profile_name):
+                    continue
+                pending.append((article, digest, profile.extractor_chain if profile else None))
+
+            # extraction fans out over the worker pool, one page per worker
+            results = await asyncio.gather(
+                *(_reextract(archive, digest, article.url, chain) for article, digest, chain in pending)
+            )
+            extracted = []
+            for (article, _, _), result in zip(pending, results):
+                if not result or not result["content"]:
+                    counts["extraction_failed"] += 1
+                    continue
+                extracted.append((article, result))
+            if not extracted:
+                continue
+
+            predictions = await inference.aclassify_articles([result["content"] for _, result in extracted])
+            for (article, result), (classification, sentiment) in zip(extracted, predictions):
+                scores = sentiment.get("scores", {})
+                article.title = result["title"] or article.title
+                article.content = result["content"]
+                article.classification = classification
+                article.sentiment = sentiment["sentiment"]
+                article.ministry_to_report = inference.CATEGORY_MINISTRY_MAPPING.get(classification, "Unknown")
+                article.positive_sentiment = int(scores.get("positive", 0) * 100)
+                article.negative_sentiment = int(scores.get("negative", 0) * 100)
+                article.neutral_sentiment = int(scores.get("neutral", 0) * 100)
+                counts["updated"] += 1
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            print(f"{min(start + batch_size, len(rows))}/{len(rows)} archived pages processed", file=sys.stderr)
+    finally:
+        db.close()
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect and reprocess the raw HTML archive")
+    parser.add_argument("--directory", default=HTML_ARCHIVE_DIR, help="Archive directory (default HTML_ARCHIVE_DIR)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reprocess_parser = sub.add_parser("reprocess", help="Re-extract and re-score stored articles offline")
+    reprocess_parser.add_argument("--profile", help="Only articles of this profile")
+    reprocess_parser.add_argument("--since", type=float, help="Only captures fetched after this UNIX time")
+    reprocess_parser.add_argument("--batch-size", type=int, default=64)
+    reprocess_parser.add_argument("--dry-run", action="store_true", help="Report without writing to the database")
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    if not args.directory:
+        raise SystemExit("No archive directory: set HTML_ARCHIVE_DIR or pass --directory")
+    if not ZSTD_AVAILABLE:
+        raise SystemExit("zstandard is not installed")
+    archive = HtmlArchive(args.directory)
+
+    if args.command == "stats":
+        print(archive.get_stats())
+        return 0
+
+    # models come from the local cache or MODEL_DIR; reprocessing never goes online
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    counts = asyncio.run(reprocess(archive, args.profile, args.since, args.batch_size, args.dry_run))
+    print(counts)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Directory for cached pages; set to an empty string to disable the cache
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class CacheEntry:
+    def __init__(self, url: str, meta: dict, body: str):
+        self.url = url
+        self.meta = meta
+        self.body = body
+
+    def validators(self) -> dict:
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+
+class HttpCache:
+    """
+    Disk cache of page bodies and their validators (ETag / Last-Modified),
+    so the fetcher can revalidate with a conditional GET and reuse the body
+    on 304. Least recently used bodies are evicted past `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory) for name in names if name.endswith(".body")
+        )
+        self.stats = {"revalidated": 0, "stored": 0, "evicted": 0}
+
+    def _paths(self, url: str):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, digest[:2], digest)
+        return base + ".json", base + ".body"
+
+    def get(self, url: str):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, encoding="utf-8") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(url, meta, body)
+
+    def touch(self, url: str):
+        _, body_path = self._paths(url)
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+        with self._lock:
+            self.stats["revalidated"] += 1
+
+    def store(self, url: str, body: str, headers: dict):
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            return  # nothing to revalidate with
+
+        meta_path, body_path = self._paths(url)
+        previous = self.get(url)
+        meta = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+            "annotations": previous.meta.get("annotations", {}) if previous else {},
+        }
+        # annotations derived from the old body no longer apply to a new one
+        if previous and previous.body != body:
+            meta["annotations"] = {}
+
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        encoded = body.encode("utf-8")
+        old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        with open(body_path, "wb") as f:
+            f.write(encoded)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        with self._lock:
+            self._size += len(encoded) - old_size
+            self.stats["stored"] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def annotate(self, url: str, name: str, value):
+        """Attach data derived from the cached body (e.g. the links found on it)."""
+        meta_path, _ = self._paths(url)
+        entry = self.get(url)
+        if entry is None:
+            return
+        entry.meta.setdefault("annotations", {})[name] = value
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(entry.meta, f)
+
+    def annotation(self, url: str, name: str):
+        entry = self.get(url)
+        return entry.meta.get("annotations", {}).get(name) if entry else None
+
+    def _evict(self):
+        bodies = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".body"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    bodies.append((stat.st_mtime, stat.st_size, path))
+
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(bodies):
+            if self._size <= target:
+                break
+            for stale in (path, path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            self._size -= size
+            self.stats["evicted"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, size_bytes=self._size, max_bytes=self.max_bytes)
+
+
+http_cache = HttpCache(HTTP_CACHE_DIR) if HTTP_CACHE_DIR else None
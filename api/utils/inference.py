@@ -0,0 +1,423 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from api.ml_models import get_model, get_model_id
+from api.utils import cascade, inference_workers
+from api.utils.inference_cache import content_key, inference_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "25"))
+MAX_LENGTH = 512
+
+# Long-document mode scores an article over overlapping 512-token windows
+# instead of only its opening tokens. MAX_WINDOWS bounds the cost per article;
+# when an article needs more, windows are picked evenly across it.
+LONG_DOCUMENTS = os.getenv("INFERENCE_LONG_DOCUMENTS", "false").lower() == "true"
+WINDOW_OVERLAP = int(os.getenv("INFERENCE_WINDOW_OVERLAP", "128"))
+MAX_WINDOWS = int(os.getenv("INFERENCE_MAX_WINDOWS", "8"))
+WINDOW_REDUCER = os.getenv("INFERENCE_WINDOW_REDUCER", "mean")
+
+# Sequences are grouped by length and each group is padded only to its own
+# longest member, so short wire stories are not padded to feature length.
+BUCKET_EDGES = sorted(int(edge) for edge in os.getenv("INFERENCE_BUCKET_EDGES", "64,128,256,512").split(","))
+
+SENTIMENT_LABELS = ["negative", "neutral", "positive"]
+CATEGORY_LABELS = [
+    "Entertainment",
+    "Business",
+    "Politics",
+    "Judiciary",
+    "Crime",
+    "Culture",
+    "Sports",
+    "Science",
+    "International",
+    "Technology",
+]
+CATEGORY_MINISTRY_MAPPING = {
+    "Entertainment": "Ministry of Information and Broadcasting",
+    "Business": "Ministry of Finance",
+    "Politics": "Ministry of Parliamentary Affairs",
+    "Judiciary": "Ministry of Law and Justice",
+    "Crime": "Ministry of Home Affairs",
+    "Culture": "Ministry of Culture",
+    "Sports": "Ministry of Youth Affairs and Sports",
+    "Science": "Ministry of Science and Technology",
+    "International": "Ministry of External Affairs",
+    "Technology": "Ministry of Electronics and Information Technology"
+}
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def split_windows(tokenizer, texts: list, max_windows: int = MAX_WINDOWS, overlap: int = WINDOW_OVERLAP):
+    """
+    Tokenize texts into model-ready sequences. Returns (sequences, owners,
+    weights): the token ids of each sequence, the index of the text it came
+    from and the number of real content tokens it holds.
+    """
+    if not LONG_DOCUMENTS:
+        sequences = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)["input_ids"]
+        return sequences, list(range(len(texts))), [len(ids) for ids in sequences]
+
+    body = MAX_LENGTH - tokenizer.num_special_tokens_to_add(pair=False)
+    step = max(body - overlap, 1)
+    sequences, owners, weights = [], [], []
+    for owner, ids in enumerate(tokenizer(texts, add_special_tokens=False)["input_ids"]):
+        starts = list(range(0, max(len(ids) - overlap, 1), step))
+        if len(starts) > max_windows:
+            picks = np.linspace(0, len(starts) - 1, max_windows).round().astype(int)
+            starts = [starts[i] for i in picks]
+        for start in starts:
+            window = ids[start:start + body]
+            sequences.append(tokenizer.build_inputs_with_special_tokens(window))
+            owners.append(owner)
+            weights.append(max(len(window), 1))
+    return sequences, owners, weights
+
+
+def bucket_sequences(sequences: list, edges: list = BUCKET_EDGES) -> dict:
+    """Group sequence indices by the smallest bucket edge that fits them, shortest first."""
+    buckets = {}
+    for index in sorted(range(len(sequences)), key=lambda i: len(sequences[i])):
+        length = len(sequences[index])
+        edge = next((e for e in edges if length <= e), edges[-1])
+        buckets.setdefault(edge, []).append(index)
+    return buckets
+
+
+padding_stats = {}
+_padding_lock = threading.Lock()
+
+
+def _record_padding(kind: str, edge: int, attention_mask: np.ndarray):
+    with _padding_lock:
+        bucket = padding_stats.setdefault(kind, {}).setdefault(
+            edge, {"batches": 0, "sequences": 0, "real_tokens": 0, "padded_tokens": 0}
+        )
+        bucket["batches"] += 1
+        bucket["sequences"] += attention_mask.shape[0]
+        bucket["real_tokens"] += int(attention_mask.sum())
+        bucket["padded_tokens"] += int(attention_mask.size)
+
+
+def drain_padding_stats() -> dict:
+    """Padding counters recorded since the last drain, e.g. by one worker batch."""
+    global padding_stats
+    with _padding_lock:
+        drained, padding_stats = padding_stats, {}
+    return drained
+
+
+def merge_padding_stats(counters: dict):
+    """Add counters drained in an inference worker to this process's padding stats."""
+    with _padding_lock:
+        for kind, buckets in counters.items():
+            for edge, counts in buckets.items():
+                bucket = padding_stats.setdefault(kind, {}).setdefault(
+                    edge, {"batches": 0, "sequences": 0, "real_tokens": 0, "padded_tokens": 0}
+                )
+                for name, value in counts.items():
+                    bucket[name] += value
+
+
+def get_padding_stats() -> dict:
+    """Padding efficiency (real tokens / padded tokens) per model and bucket."""
+    report = {}
+    with _padding_lock:
+        for kind, buckets in padding_stats.items():
+            real = sum(b["real_tokens"] for b in buckets.values())
+            padded = sum(b["padded_tokens"] for b in buckets.values())
+            report[kind] = {
+                "efficiency": real / padded if padded else None,
+                "buckets": {
+                    edge: dict(b, efficiency=b["real_tokens"] / b["padded_tokens"])
+                    for edge, b in sorted(buckets.items())
+                },
+            }
+    return report
+
+
+def forward(kind: str, tokenizer, model, sequences: list) -> np.ndarray:
+    logits = [None] * len(sequences)
+    for edge, indices in bucket_sequences(sequences).items():
+        for i in range(0, len(indices), MAX_BATCH_SIZE):
+            chunk = indices[i:i + MAX_BATCH_SIZE]
+            # compiled models only have graphs for the bucket edges, so pad to the edge
+            padding = "max_length" if edge in getattr(model, "fixed_lengths", ()) else True
+            inputs = tokenizer.pad(
+                {"input_ids": [sequences[j] for j in chunk]}, padding=padding, max_length=edge, return_tensors="np"
+            )
+            _record_padding(kind, edge, inputs["attention_mask"])
+            for j, row in zip(chunk, np.asarray(model(dict(inputs)).logits)):
+                logits[j] = row
+    return np.stack(logits)
+
+
+REDUCERS = {
+    "mean": lambda rows, weights: rows.mean(axis=0),
+    "max": lambda rows, weights: rows.max(axis=0),
+    "weighted": lambda rows, weights: (rows * weights[:, None]).sum(axis=0) / weights.sum(),
+}
+
+
+def reduce_logits(logits: np.ndarray, owners: list, weights: list, count: int, reducer: str = WINDOW_REDUCER) -> np.ndarray:
+    """Combine the window logits of each text into a single row."""
+    combine = REDUCERS.get(reducer)
+    if combine is None:
+        raise ValueError(f"Unknown window reducer '{reducer}', expected one of {sorted(REDUCERS)}")
+
+    owners = np.asarray(owners)
+    weights = np.asarray(weights, dtype=np.float64)
+    reduced = np.empty((count, logits.shape[1]), dtype=np.float64)
+    for i in range(count):
+        mask = owners == i
+        reduced[i] = combine(logits[mask], weights[mask])
+    return reduced
+
+
+def run_model(kind: str, texts: list) -> np.ndarray:
+    """
+    Run the `kind` model ("sentiment" or "news") over a batch of texts and
+    return the class probabilities, one row per text.
+    """
+    tokenizer = get_model(f"{kind}_tokenizer")
+    model = get_model(f"{kind}_model")
+    if tokenizer is None or model is None:
+        raise RuntimeError(f"The {kind} model is not loaded")
+
+    sequences, owners, weights = split_windows(tokenizer, texts)
+    logits = forward(kind, tokenizer, model, sequences)
+    if len(sequences) == len(texts):
+        return softmax(logits)
+    return softmax(reduce_logits(logits, owners, weights, len(texts)))
+
+
+def sentiment_from_probs(scores) -> dict:
+    max_score = int(np.argmax(scores))
+    return {
+        "sentiment": SENTIMENT_LABELS[max_score],
+        "scores": {
+            "negative": float(scores[0]),
+            "neutral": float(scores[1]),
+            "positive": float(scores[2])
+        }
+    }
+
+
+def category_from_probs(probs) -> str:
+    predicted_index = int(np.argmax(probs))
+    if predicted_index < len(CATEGORY_LABELS):
+        return CATEGORY_LABELS[predicted_index]
+    return f"label_{predicted_index}"
+
+
+class MicroBatcher:
+    """
+    Collects texts submitted from any thread or event loop and runs them
+    through the model in batches. A batch is flushed as soon as it holds
+    `max_batch_size` texts or the oldest text has waited `max_wait_ms`.
+    Batches run inline or on the inference worker pool; while every worker
+    is busy, new requests keep accumulating into the next batch.
+    """
+
+    def __init__(self, kind: str, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.kind = kind
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max(inference_workers.INFERENCE_WORKERS, 1))
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0, "inference_seconds": 0.0}
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._worker, name=f"{self.kind}-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self, texts: list) -> Future:
+        if inference_workers.enabled():
+            return inference_workers.submit_batch(self.kind, texts)
+        future = Future()
+        try:
+            future.set_result(run_model(self.kind, texts))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _resolve(self, batch: list, result: Future, started: float):
+        self._in_flight.release()
+        error = result.exception()
+        if error is not None:
+            logger.error(f"{self.kind} batch of {len(batch)} failed: {error}")
+            if isinstance(error, BrokenProcessPool):
+                # a worker died (e.g. OOM-killed); later batches get a fresh pool
+                inference_workers.reset_pool()
+            for _, future in batch:
+                future.set_exception(error)
+            return
+
+        elapsed = time.perf_counter() - started
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        self.stats["inference_seconds"] += elapsed
+        logger.debug(f"{self.kind} batch of {len(batch)} ran in {elapsed:.3f}s")
+
+        for (_, future), row in zip(batch, result.result()):
+            future.set_result(row)
+
+    def _worker(self):
+        while True:
+            self._in_flight.acquire()
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                result = self._dispatch([text for text, _ in batch])
+            except Exception as e:
+                # a broken pool raises on submit; fail this batch rather than the batcher thread
+                result = Future()
+                result.set_exception(e)
+            result.add_done_callback(lambda f, batch=batch, started=started: self._resolve(batch, f, started))
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(kind: str) -> MicroBatcher:
+    with _batchers_lock:
+        if kind not in _batchers:
+            _batchers[kind] = MicroBatcher(kind)
+        return _batchers[kind]
+
+
+def _submit_to_model(kind: str, model_id: str, key: str, text: str) -> Future:
+    future = get_batcher(kind).submit(text)
+    future.add_done_callback(
+        lambda f: f.exception() is None and inference_cache.put(kind, model_id, key, f.result())
+    )
+    return future
+
+
+def _submit_all(kind: str, texts: list) -> list:
+    """
+    Return a future of class probabilities for every text. Cached content is
+    answered immediately, identical texts share a single request, and the
+    optional cascade answers confident texts without the transformer.
+    """
+    model_id = get_model_id(kind)
+    pending = {}
+    futures = []
+    for text in texts:
+        key = content_key(model_id, text)
+        if key in pending:
+            futures.append(pending[key])
+            continue
+
+        cached = inference_cache.get(kind, model_id, key)
+        if cached is not None:
+            future = Future()
+            future.set_result(np.asarray(cached))
+        else:
+            future = cascade.predict(
+                kind, text, lambda t, key=key: _submit_to_model(kind, model_id, key, t)
+            )
+        pending[key] = future
+        futures.append(future)
+    return futures
+
+
+def predict_sentiment_batch(texts: list) -> list:
+    return [sentiment_from_probs(f.result()) for f in _submit_all("sentiment", texts)]
+
+
+def predict_news_category_batch(texts: list) -> list:
+    return [category_from_probs(f.result()) for f in _submit_all("news", texts)]
+
+
+def predict_sentiment(text: str) -> dict:
+    return predict_sentiment_batch([text])[0]
+
+
+def predict_news_category(text: str) -> str:
+    return predict_news_category_batch([text])[0]
+
+
+async def apredict_sentiment_batch(texts: list) -> list:
+    futures = _submit_all("sentiment", texts)
+    rows = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    return [sentiment_from_probs(row) for row in rows]
+
+
+async def apredict_news_category_batch(texts: list) -> list:
+    futures = _submit_all("news", texts)
+    rows = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    return [category_from_probs(row) for row in rows]
+
+
+def classify_articles(texts: list) -> list:
+    """
+    Predict (category, sentiment) for every text. Both models' requests are
+    queued before waiting so they are batched and run side by side.
+    """
+    news_futures = _submit_all("news", texts)
+    sentiment_futures = _submit_all("sentiment", texts)
+    return [
+        (category_from_probs(n.result()), sentiment_from_probs(s.result()))
+        for n, s in zip(news_futures, sentiment_futures)
+    ]
+
+
+async def aclassify_articles(texts: list) -> list:
+    classifications, sentiments = await asyncio.gather(
+        apredict_news_category_batch(texts),
+        apredict_sentiment_batch(texts),
+    )
+    return list(zip(classifications, sentiments))
+
+
+def get_stats() -> dict:
+    return {
+        "batchers": {kind: dict(batcher.stats) for kind, batcher in _batchers.items()},
+        "padding": get_padding_stats(),
+        "cache": inference_cache.get_stats(),
+        "workers": inference_workers.get_pool_status() if inference_workers.enabled() else None,
+    }
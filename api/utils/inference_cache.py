@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_SIZE", "20000"))
+# Optional SQLite file backing the in-process LRU so results survive restarts
+CACHE_PATH = os.getenv("INFERENCE_CACHE_PATH")
+# Rows kept in the SQLite file; the oldest writes are evicted past this
+DISK_CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_DISK_SIZE", "500000"))
+EVICT_EVERY = 1000  # writes between size checks of the SQLite file
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def content_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class InferenceCache:
+    """
+    Two-tier cache of model probabilities keyed by a hash of the normalized
+    text and the model identifier. The first time a model is seen with a new
+    identifier, everything cached for the previous one is dropped.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE, path: str = CACHE_PATH, max_disk_entries: int = DISK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._writes = 0
+        self._entries = OrderedDict()
+        self._model_ids = {}
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "invalidations": 0, "disk_evictions": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS inference_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, model_id TEXT NOT NULL, probs TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def _check_model(self, kind: str, model_id: str):
+        if self._model_ids.get(kind) == model_id:
+            return
+        if kind in self._model_ids:
+            logger.info(f"{kind} model changed to {model_id}, dropping cached predictions")
+            self.stats["invalidations"] += 1
+        self._model_ids[kind] = model_id
+        for key in [k for k, (entry_kind, _) in self._entries.items() if entry_kind == kind]:
+            del self._entries[key]
+        if self._db is not None:
+            self._db.execute(
+                "DELETE FROM inference_cache WHERE kind = ? AND model_id != ?", (kind, model_id)
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, kind: str, probs: list):
+        self._entries[key] = (kind, probs)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, kind: str, model_id: str, key: str):
+        with self._lock:
+            self._check_model(kind, model_id)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._entries[key][1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT probs FROM inference_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    probs = json.loads(row[0])
+                    self._remember(key, kind, probs)
+                    self.stats["disk_hits"] += 1
+                    return probs
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, kind: str, model_id: str, key: str, probs):
+        probs = [float(p) for p in probs]
+        with self._lock:
+            self._check_model(kind, model_id)
+            self._remember(key, kind, probs)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO inference_cache (key, kind, model_id, probs) VALUES (?, ?, ?, ?)",
+                    (key, kind, model_id, json.dumps(probs)),
+                )
+                self._writes += 1
+                if self._writes % EVICT_EVERY == 0:
+                    self._evict_disk()
+                self._db.commit()
+
+    def _evict_disk(self):
+        # INSERT OR REPLACE gives a rewritten row a new rowid, so the lowest rowids are the oldest writes
+        (count,) = self._db.execute("SELECT COUNT(*) FROM inference_cache").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM inference_cache WHERE rowid IN "
+                "(SELECT rowid FROM inference_cache ORDER BY rowid LIMIT ?)", (excess,)
+            )
+            self.stats["disk_evictions"] += excess
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                persistent=self._db is not None,
+                hit_rate=hits / lookups if lookups else None,
+            )
+
+
+inference_cache = InferenceCache()
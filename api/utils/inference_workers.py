@@ -0,0 +1,132 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 0 runs inference inline in the API process; N > 0 starts N worker processes,
+# each holding its own copy of both models.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# Per-worker TF thread pools (0 lets TensorFlow decide)
+TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", "0"))
+TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", "0"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_pings = []
+
+
+def _init_worker(intra_op_threads: int, inter_op_threads: int):
+    import tensorflow as tf
+
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+    from api.ml_models import load_models
+    load_models()
+
+
+def _build_artifacts():
+    from api.ml_models import load_models
+    load_models()
+
+
+def _run_batch(kind: str, texts: list):
+    from api.utils.inference import drain_padding_stats, run_model
+    # padding counters live in the worker; they travel back with the batch
+    return run_model(kind, texts), drain_padding_stats()
+
+
+def _worker_status() -> dict:
+    from api.ml_models import get_model_status
+    return {"pid": os.getpid(), "models": get_model_status()}
+
+
+def enabled() -> bool:
+    return INFERENCE_WORKERS > 0
+
+
+def _prepare_artifacts():
+    """
+    Write the MODEL_DIR copies and ONNX exports once, in a single short-lived
+    process, so that workers starting together only read them.
+    """
+    from api.ml_models import artifacts_missing
+
+    if not artifacts_missing():
+        return
+    logger.info("Building model artifacts before starting the inference workers")
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as builder:
+        builder.submit(_build_artifacts).result()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _prepare_artifacts()
+            logger.info(f"Starting {INFERENCE_WORKERS} inference workers")
+            # spawn, not fork: TF runtimes do not survive being forked
+            _pool = ProcessPoolExecutor(
+                max_workers=INFERENCE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS),
+            )
+            # one ping per worker starts them all and reports their models to /health/ready
+            _pings[:] = [_pool.submit(_worker_status) for _ in range(INFERENCE_WORKERS)]
+        return _pool
+
+
+def start_pool():
+    """Start the workers in the background and have them load their models right away."""
+    threading.Thread(target=get_pool, name="inference-workers", daemon=True).start()
+
+
+def submit_batch(kind: str, texts: list) -> Future:
+    from api.utils.inference import merge_padding_stats
+
+    result = Future()
+
+    def done(batch: Future):
+        error = batch.exception()
+        if error is not None:
+            result.set_exception(error)
+            return
+        probs, padding = batch.result()
+        merge_padding_stats(padding)
+        result.set_result(probs)
+
+    get_pool().submit(_run_batch, kind, texts).add_done_callback(done)
+    return result
+
+
+def get_pool_status() -> dict:
+    workers = {}
+    for ping in _pings:
+        if ping.done() and ping.exception() is None:
+            status = ping.result()
+            workers[status["pid"]] = status["models"]
+    ready = any(
+        all(model["state"] == "ready" for model in models.values())
+        for models in workers.values()
+    )
+    return {"configured": INFERENCE_WORKERS, "ready": ready, "workers": workers}
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        # the next pool pings its own workers
+        _pings.clear()
+
+
+def shutdown_pool():
+    reset_pool()
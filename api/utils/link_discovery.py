@@ -0,0 +1,83 @@
+import logging
+import os
+from urllib.parse import urljoin, urlsplit
+
+import lxml.html
+from lxml.etree import ParserError
+
+from api.utils.browser_pool import browser_pool
+from api.utils.fetcher import FetchError, FetchResult, fetcher
+from api.utils.http_cache import http_cache
+
+logger = logging.getLogger(__name__)
+
+# Fewer links than this in the server-rendered page means it needs the browser
+LINK_DISCOVERY_MIN_LINKS = int(os.getenv("LINK_DISCOVERY_MIN_LINKS", "20"))
+
+
+def parse_links(page_url: str, page_html: str) -> list:
+    """Absolute http(s) links of an HTML page, shaped like the crawler's link objects."""
+    try:
+        document = lxml.html.fromstring(page_html)
+    except (ParserError, ValueError):
+        return []
+    links, seen = [], set()
+    for anchor in document.iter("a"):
+        href = (anchor.get("href") or "").strip()
+        if not href or href.startswith("#"):
+            continue
+        href = urljoin(page_url, href)
+        if urlsplit(href).scheme not in ("http", "https") or href in seen:
+            continue
+        seen.add(href)
+        links.append({"href": href, "text": " ".join(anchor.text_content().split())})
+    return links
+
+
+async def fetch_page(url: str):
+    try:
+        return await fetcher.fetch(url)
+    except FetchError as e:
+        logger.debug(f"Could not fetch {url}: {e}")
+        return None
+
+
+async def extract_http_urls(url: str, page: FetchResult = None) -> list:
+    """Links of the server-rendered page, fetched over plain HTTP without a browser."""
+    page = page or await fetch_page(url)
+    if page is None:
+        return []
+    links = parse_links(page.url, page.text)
+    logger.info(f"Found {len(links)} URLs in the HTML of {url}")
+    return links
+
+
+async def extract_all_urls(url: str, page: FetchResult = None):
+    """
+    Extract all URLs from a given webpage. The page is revalidated with a
+    conditional GET first; when it has not changed since the last crawl,
+    the links found then are reused without rendering it again.
+    """
+    logger.info(f"Extracting URLs from {url}")
+    if page is None and http_cache:
+        page = await fetch_page(url)
+
+    if page is not None and page.not_modified:
+        links = http_cache.annotation(url, "links")
+        if links is not None:
+            logger.info(f"{url} not modified, reusing {len(links)} URLs from the last crawl")
+            return links
+
+    result = await browser_pool.arun(url)
+    if not result.success:
+        # nothing is cached, so the next crawl renders the page again
+        logger.error(f"Error rendering {url}: {result.error_message}")
+        return []
+    urls = []
+    urls.extend(result.links.get("external", []))
+    urls.extend(result.links.get("internal", []))
+    if urls and page is not None and http_cache:
+        http_cache.annotate(url, "links", urls)
+
+    logger.info(f"Found {len(urls)} URLs in {url}")
+    return urls
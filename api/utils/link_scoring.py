@@ -0,0 +1,167 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# JSON file the learned per-domain URL patterns are kept in; empty keeps them in memory only
+LINK_PATTERNS_PATH = os.getenv("LINK_PATTERNS_PATH", "link_patterns.json")
+MAX_PATTERNS_PER_HOST = int(os.getenv("LINK_MAX_PATTERNS_PER_HOST", "500"))
+
+# Path segments of navigation, account and listing pages
+NAV_SEGMENTS = {
+    "login", "signin", "sign-in", "signup", "register", "subscribe", "subscription", "account",
+    "profile", "tag", "tags", "topic", "topics", "category", "categories", "section", "author",
+    "authors", "about", "about-us", "contact", "contact-us", "privacy", "privacy-policy", "terms",
+    "search", "newsletter", "newsletters", "epaper", "e-paper", "rss", "feed", "feeds", "archive",
+    "video", "videos", "gallery", "photos", "photo", "podcast", "podcasts", "live-tv", "games",
+    "careers", "advertise", "help", "faq", "sitemap", "page",
+}
+ARTICLE_EXTENSIONS = (".ece", ".html", ".htm", ".cms", ".php")
+NAV_ANCHORS = {
+    "home", "login", "sign in", "subscribe", "more", "read more", "next", "previous",
+    "menu", "search", "e-paper", "epaper", "videos", "photos", "latest",
+}
+
+_DATE_PATH = re.compile(r"/(19|20)\d{2}/(0?[1-9]|1[0-2])(/|$)|/(19|20)\d{2}-\d{2}-\d{2}")
+_LONG_NUMBER = re.compile(r"\d{5,}")
+_SLUG = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+){3,}")
+
+
+def _site(host: str) -> str:
+    return host[len("www."):] if host.startswith("www.") else host
+
+
+def url_pattern(url: str):
+    """(host, path template) of a URL: slugs and numbers are abstracted, section names kept."""
+    parts = urlsplit(url)
+    shapes = []
+    for segment in [s for s in parts.path.lower().split("/") if s]:
+        if _SLUG.match(segment):
+            extension = os.path.splitext(segment)[1]
+            shapes.append("{slug}" + re.sub(r"\d+", "9", extension))
+        else:
+            shapes.append(re.sub(r"\d+", "9", segment))
+    return _site(parts.hostname or ""), "/" + "/".join(shapes)
+
+
+def shape_score(url: str, anchor_text: str, base_host: str) -> float:
+    """Heuristic article-likeness of a link from its URL shape, anchor text and host."""
+    parts = urlsplit(url)
+    path = parts.path.lower()
+    segments = [s for s in path.split("/") if s]
+    last = segments[-1] if segments else ""
+    score = 0.0
+
+    if _site(parts.hostname or "") != _site(base_host):
+        score -= 3.0
+    if not segments:
+        score -= 3.0
+    elif len(segments) == 1 and not _SLUG.match(last):
+        score -= 1.0
+    else:
+        score += min(len(segments), 4) * 0.25
+    if any(segment in NAV_SEGMENTS for segment in segments):
+        score -= 2.5
+    if _SLUG.match(last):
+        score += 2.0
+    if _LONG_NUMBER.search(last):
+        score += 1.5
+    if path.endswith(ARTICLE_EXTENSIONS):
+        score += 0.5
+    if _DATE_PATH.search(path):
+        score += 1.0
+    if parts.query:
+        score -= 0.5
+
+    anchor = " ".join((anchor_text or "").split()).lower()
+    words = len(anchor.split())
+    if anchor in NAV_ANCHORS:
+        score -= 2.0
+    elif words >= 5:
+        score += 1.5
+    elif words <= 2:
+        score -= 0.5
+    return score
+
+
+class LinkScorer:
+    """
+    Ranks the links found on a profile's start page so the per-profile
+    fetch budget goes to the likeliest articles. Each link gets a URL-shape
+    and anchor-text score plus the log-odds of its path pattern having
+    produced a stored article on that site before.
+    """
+
+    def __init__(self, path: str = LINK_PATTERNS_PATH):
+        self.path = path
+        self._patterns = {}   # site -> template -> [accepted, attempts]
+        self._lock = threading.Lock()
+        self.stats = {"ranked": 0, "recorded": 0, "accepted": 0}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._patterns = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load link patterns from {path}: {e}")
+
+    def learned_score(self, url: str) -> float:
+        site, template = url_pattern(url)
+        with self._lock:
+            accepted, attempts = self._patterns.get(site, {}).get(template, (0, 0))
+        # Laplace-smoothed log-odds: 0 for unseen patterns, grows with evidence
+        return math.log((accepted + 1) / (attempts - accepted + 1))
+
+    def score(self, url: str, anchor_text: str, base_url: str) -> float:
+        return shape_score(url, anchor_text, urlsplit(base_url).hostname or "") + self.learned_score(url)
+
+    def rank(self, base_url: str, links: list) -> list:
+        """Order (url, anchor text) pairs best first and return the URLs."""
+        scored = sorted(links, key=lambda link: self.score(link[0], link[1], base_url), reverse=True)
+        with self._lock:
+            self.stats["ranked"] += len(links)
+        return [url for url, _ in scored]
+
+    def record(self, url: str, accepted: bool):
+        """Feed back whether a fetched link turned out to be a storable article."""
+        site, template = url_pattern(url)
+        with self._lock:
+            patterns = self._patterns.setdefault(site, {})
+            counts = patterns.setdefault(template, [0, 0])
+            counts[0] += int(accepted)
+            counts[1] += 1
+            if len(patterns) > MAX_PATTERNS_PER_HOST:
+                # forget the patterns with the least evidence
+                for stale, _ in sorted(patterns.items(), key=lambda item: item[1][1])[:len(patterns) // 10]:
+                    del patterns[stale]
+            self.stats["recorded"] += 1
+            self.stats["accepted"] += int(accepted)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._patterns)
+        # the scheduler and crawl triggers save from different threads; each writes its own temp file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save link patterns to {self.path}: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self.stats,
+                sites=len(self._patterns),
+                patterns=sum(len(patterns) for patterns in self._patterns.values()),
+            )
+
+
+link_scorer = LinkScorer()
@@ -0,0 +1,252 @@
+"""
+Near-duplicate detection for syndicated stories.
+
+Wire copies of one story show up on several profiles with small edits. Each
+article's content is reduced to a MinHash signature of its word shingles,
+and the signatures are indexed with LSH banding: only articles sharing at
+least one band with the new one are compared, so a lookup costs the same
+whatever the size of the table. Every article carries a cluster_id (the id
+of the first article of its story), and a new article whose estimated
+similarity to a stored one reaches NEAR_DUP_THRESHOLD reuses that article's
+scores instead of going through the models again.
+
+Articles stored before clusters existed get theirs with
+
+    python -m api.utils.near_duplicates backfill
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from api.models import Article
+
+logger = logging.getLogger(__name__)
+
+# "reuse" stores copies with the matched article's scores, "skip" drops them, "off" disables detection
+NEAR_DUP_MODE = os.getenv("NEAR_DUP_MODE", "reuse").lower()
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+NEAR_DUP_SHINGLE_WORDS = int(os.getenv("NEAR_DUP_SHINGLE_WORDS", "5"))
+NEAR_DUP_PERMUTATIONS = int(os.getenv("NEAR_DUP_PERMUTATIONS", "64"))
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "16"))
+# Only articles published in this many days are indexed at startup; 0 indexes all
+NEAR_DUP_WINDOW_DAYS = int(os.getenv("NEAR_DUP_WINDOW_DAYS", "30"))
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+PUNCTUATION = ".,;:!?\"'()[]{}<>“”‘’«»—–-|/"
+
+SCORE_FIELDS = (
+    "classification", "sentiment", "ministry_to_report",
+    "positive_sentiment", "negative_sentiment", "neutral_sentiment",
+)
+
+
+def shingles(text: str, size: int = NEAR_DUP_SHINGLE_WORDS) -> set:
+    """Hashes of the overlapping `size`-word windows of the text, ignoring case and punctuation."""
+    words = [word for word in (token.strip(PUNCTUATION) for token in text.lower().split()) if word]
+    if len(words) < size:
+        return set()
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+class NearDuplicateIndex:
+    """
+    In-memory MinHash/LSH index of recent article contents. Signatures are
+    split into `bands` bands of equal width; two articles become candidates
+    when any band matches exactly, and candidates are confirmed by the
+    fraction of equal signature values.
+    """
+
+    def __init__(self, permutations: int = NEAR_DUP_PERMUTATIONS, bands: int = NEAR_DUP_BANDS,
+                 threshold: float = NEAR_DUP_THRESHOLD):
+        if permutations % bands:
+            raise ValueError(f"NEAR_DUP_PERMUTATIONS ({permutations}) must be a multiple of NEAR_DUP_BANDS ({bands})")
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        self.threshold = threshold
+        # fixed seed: signatures must stay comparable across restarts and processes
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=permutations, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=permutations, dtype=np.int64).astype(np.uint64)
+        self._lock = threading.Lock()
+        self._reset()
+        self.ready = False
+        self.stats = {"lookups": 0, "candidates": 0, "matches": 0, "reused": 0, "skipped": 0}
+
+    def _reset(self):
+        self._signatures = {}
+        self._clusters = {}
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def signature(self, text: str):
+        """MinHash signature of the text, or None when it is shorter than one shingle."""
+        hashes = shingles(text or "")
+        if not hashes:
+            return None
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        # universal hashing (a*x + b) mod p per permutation; uint64 overflow wraps, as intended
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(values, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _add(self, article_id: int, cluster_id: int, signature: np.ndarray):
+        self._signatures[article_id] = signature
+        self._clusters[article_id] = cluster_id
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(article_id)
+
+    def add(self, article_id: int, cluster_id: int, signature):
+        if signature is None:
+            return
+        with self._lock:
+            self._add(article_id, cluster_id, signature)
+
+    def _query(self, signature: np.ndarray):
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        self.stats["lookups"] += 1
+        self.stats["candidates"] += len(candidates)
+        if not candidates:
+            return None
+        ids = list(candidates)
+        similarities = (np.stack([self._signatures[i] for i in ids]) == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None
+        self.stats["matches"] += 1
+        return ids[best], self._clusters[ids[best]], float(similarities[best])
+
+    def query(self, signature):
+        """(article_id, cluster_id, similarity) of the closest indexed article above the threshold, or None."""
+        if signature is None:
+            return None
+        with self._lock:
+            return self._query(signature)
+
+    def rebuild(self, db: Session):
+        query = db.query(Article.id, Article.cluster_id, Article.content).order_by(Article.id)
+        if NEAR_DUP_WINDOW_DAYS > 0:
+            query = query.filter(Article.published_at >= datetime.utcnow() - timedelta(days=NEAR_DUP_WINDOW_DAYS))
+        # build off to the side; lookups keep using the old index meanwhile
+        index = NearDuplicateIndex(self.permutations, self.bands, self.threshold)
+        count = 0
+        for article_id, cluster_id, content in query.yield_per(1000):
+            index.add(article_id, cluster_id or article_id, index.signature(content))
+            count += 1
+        with self._lock:
+            # keep articles saved while the rebuild was running
+            for article_id, signature in self._signatures.items():
+                if article_id not in index._signatures:
+                    index._add(article_id, self._clusters[article_id], signature)
+            self._signatures, self._clusters, self._buckets = index._signatures, index._clusters, index._buckets
+            self.ready = True
+        logger.info(f"Near-duplicate index rebuilt from {count} articles")
+
+    def match_stored(self, db: Session, contents: list) -> list:
+        """
+        (signature, duplicate) for each content, where duplicate is the stored
+        Article it nearly duplicates, or None. Matched articles are loaded in
+        one query.
+        """
+        if NEAR_DUP_MODE == "off":
+            return [(None, None) for _ in contents]
+        signatures = [self.signature(content) for content in contents]
+        matches = [self.query(signature) for signature in signatures]
+        ids = {match[0] for match in matches if match}
+        stored = {article.id: article for article in db.query(Article).filter(Article.id.in_(ids)).all()} if ids else {}
+        results = []
+        for signature, match in zip(signatures, matches):
+            duplicate = stored.get(match[0]) if match else None
+            if duplicate is not None:
+                logger.info(f"Near-duplicate of article {duplicate.id} ({match[2]:.2f} similar): {duplicate.url}")
+            results.append((signature, duplicate))
+        return results
+
+    def record(self, duplicate):
+        """Count what happened to a near-duplicate under NEAR_DUP_MODE."""
+        if duplicate is not None:
+            with self._lock:
+                self.stats["skipped" if NEAR_DUP_MODE == "skip" else "reused"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self.stats, ready=self.ready, mode=NEAR_DUP_MODE, threshold=self.threshold,
+                indexed=len(self._signatures), clusters=len(set(self._clusters.values())),
+            )
+
+
+def reused_scores(article: Article) -> dict:
+    """Classification and sentiment columns of a stored article, for copying onto its near-duplicate."""
+    return {field: getattr(article, field) for field in SCORE_FIELDS}
+
+
+def cluster_of(article: Article, duplicate) -> int:
+    """Cluster of a freshly flushed article: its duplicate's cluster, or a new one named after itself."""
+    if duplicate is None:
+        return article.id
+    return duplicate.cluster_id or duplicate.id
+
+
+near_duplicates = NearDuplicateIndex()
+
+
+def backfill(db: Session, batch_size: int = 500) -> dict:
+    """Index every stored article in id order, giving unclustered ones a cluster."""
+    index = NearDuplicateIndex()
+    counts = {"articles": 0, "clustered": 0, "duplicates": 0}
+    last_id = 0
+    while True:
+        # keyset pages, so committing between them never invalidates an open cursor
+        batch = db.query(Article).filter(Article.id > last_id).order_by(Article.id).limit(batch_size).all()
+        if not batch:
+            break
+        for article in batch:
+            signature = index.signature(article.content)
+            if article.cluster_id is None:
+                match = index.query(signature)
+                article.cluster_id = match[1] if match else article.id
+                counts["clustered"] += 1
+                counts["duplicates"] += bool(match)
+            index.add(article.id, article.cluster_id, signature)
+        last_id = batch[-1].id
+        counts["articles"] += len(batch)
+        db.commit()
+        print(f"{counts['articles']} articles indexed", file=sys.stderr)
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Near-duplicate clusters of stored articles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="Assign a cluster_id to articles stored without one")
+    args = parser.parse_args(argv)
+
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            print(backfill(db))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
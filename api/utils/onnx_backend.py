@@ -0,0 +1,187 @@
+"""
+ONNX Runtime backend for the sentiment and news classifiers.
+
+The TF checkpoints are exported once to ONNX (optionally with dynamic INT8
+weight quantization) and then served by onnxruntime on CPU. Usage:
+
+    python -m api.utils.onnx_backend export
+    python -m api.utils.onnx_backend parity --threshold 0.98 --texts sample.txt
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+ONNX_OPSET = 14
+
+
+def onnx_model_path(kind: str, model_path: str, quantized: bool = ONNX_QUANTIZE) -> str:
+    # The checkpoint is part of the file name so a new model path never reuses a stale export
+    digest = hashlib.sha1(model_path.encode("utf-8")).hexdigest()[:10]
+    suffix = ".int8" if quantized else ""
+    return os.path.join(ONNX_MODEL_DIR, f"{kind}-{digest}{suffix}.onnx")
+
+
+def export_to_onnx(tf_model, output_path: str):
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (
+        tf.TensorSpec((None, None), tf.int32, name="input_ids"),
+        tf.TensorSpec((None, None), tf.int32, name="attention_mask"),
+    )
+
+    @tf.function(input_signature=signature)
+    def serving(input_ids, attention_mask):
+        return tf_model(input_ids=input_ids, attention_mask=attention_mask, training=False).logits
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tf2onnx.convert.from_function(serving, input_signature=signature, opset=ONNX_OPSET, output_path=output_path)
+
+
+def quantize_onnx(input_path: str, output_path: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+
+
+def _write_atomically(write, path: str):
+    """
+    Run write(tmp_path) next to `path` and move the result into place, so a
+    killed or concurrent build never leaves a truncated file at `path`.
+    """
+    tmp_path = f"{path[:-len('.onnx')]}.{os.getpid()}.{threading.get_ident()}.tmp.onnx"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_onnx_model(kind: str, model_path: str, token: str = None, quantized: bool = ONNX_QUANTIZE, source: str = None) -> str:
+    """
+    Export (and quantize) the checkpoint unless the ONNX file already exists.
+    `source` is a local copy of `model_path` to export from, if there is one.
+    """
+    from transformers import TFAutoModelForSequenceClassification
+
+    output_path = onnx_model_path(kind, model_path, quantized)
+    if os.path.exists(output_path):
+        return output_path
+
+    fp32_path = onnx_model_path(kind, model_path, quantized=False)
+    if not os.path.exists(fp32_path):
+        logger.info(f"Exporting {source or model_path} to {fp32_path}")
+        started = time.perf_counter()
+        tf_model = TFAutoModelForSequenceClassification.from_pretrained(source or model_path, token=token)
+        _write_atomically(lambda path: export_to_onnx(tf_model, path), fp32_path)
+        logger.info(f"Exported {kind} model in {time.perf_counter() - started:.1f}s")
+
+    if quantized:
+        logger.info(f"Quantizing {fp32_path} to INT8")
+        _write_atomically(lambda path: quantize_onnx(fp32_path, path), output_path)
+    return output_path
+
+
+class OnnxSequenceClassifier:
+    """Callable with the same input/output shape as the TF model: a dict of token arrays in, `.logits` out."""
+
+    def __init__(self, path: str, intra_op_threads: int = int(os.getenv("TF_INTRA_OP_THREADS", "0"))):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, inputs: dict, **kwargs):
+        feed = {}
+        for name in self.input_names:
+            key = "attention_mask" if "attention_mask" in name else "input_ids"
+            feed[name] = np.asarray(inputs[key], dtype=np.int32)
+        return SimpleNamespace(logits=self.session.run(None, feed)[0])
+
+
+def load_onnx_model(kind: str, model_path: str, token: str = None, source: str = None) -> OnnxSequenceClassifier:
+    return OnnxSequenceClassifier(build_onnx_model(kind, model_path, token=token, source=source))
+
+
+def label_agreement(kind: str, model_path: str, texts: list, token: str = None) -> float:
+    """Share of texts for which the TF and ONNX models predict the same label."""
+    from transformers import AutoTokenizer, TFAutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, token=token)
+    tf_model = TFAutoModelForSequenceClassification.from_pretrained(model_path, token=token)
+    onnx_model = load_onnx_model(kind, model_path, token=token)
+
+    agree = 0
+    for i in range(0, len(texts), 16):
+        inputs = dict(tokenizer(texts[i:i + 16], return_tensors="np", truncation=True, padding=True, max_length=512))
+        tf_labels = np.argmax(np.asarray(tf_model(inputs).logits), axis=-1)
+        onnx_labels = np.argmax(onnx_model(inputs).logits, axis=-1)
+        agree += int((tf_labels == onnx_labels).sum())
+    return agree / len(texts)
+
+
+def _load_parity_texts(path: str, limit: int) -> list:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:limit]
+
+    from api.database import SessionLocal
+    from api.models import Article
+
+    db = SessionLocal()
+    try:
+        return [content for (content,) in db.query(Article.content).limit(limit).all()]
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    from api.ml_models import HF_TOKEN, MODEL_PATHS
+
+    parser = argparse.ArgumentParser(description="Export the classifiers to ONNX and check parity with TF")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="Export (and quantize) both models")
+    parity = sub.add_parser("parity", help="Fail if TF/ONNX label agreement drops below a threshold")
+    parity.add_argument("--threshold", type=float, default=0.98)
+    parity.add_argument("--texts", help="File with one text per line (defaults to stored articles)")
+    parity.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        for kind, model_path in MODEL_PATHS.items():
+            print(f"{kind}: {build_onnx_model(kind, model_path, token=HF_TOKEN)}")
+        return 0
+
+    texts = _load_parity_texts(args.texts, args.limit)
+    if not texts:
+        print("No texts available for the parity check")
+        return 1
+
+    ok = True
+    for kind, model_path in MODEL_PATHS.items():
+        agreement = label_agreement(kind, model_path, texts, token=HF_TOKEN)
+        passed = agreement >= args.threshold
+        ok = ok and passed
+        print(f"{kind}: label agreement {agreement:.4f} over {len(texts)} texts ({'ok' if passed else 'FAIL'})")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
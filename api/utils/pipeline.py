@@ -3,9 +3,10 @@ import logging
 import trafilatura
 import requests
 from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
 from sqlalchemy.orm import Session
 from api.models import Article, Profile
+from api.utils.browser_pool import browser_pool
+from api.utils.fetcher import FetchError, fetcher
 import random
 
 # Configure logging
@@ -14,18 +15,16 @@ logger = logging.getLogger(__name__)
 class Crawler:
     async def get_links(self, url: str):
         logger.debug(f"Starting to crawl links from: {url}")
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            try:
-                await page.goto(url, timeout=30000)
-                html = await page.content()
-                logger.debug(f"Successfully fetched page content for: {url}")
-            except Exception as e:
-                logger.error(f"Error fetching page content for {url}: {e}")
-                await browser.close()
-                return []
-            await browser.close()
+        try:
+            result = await browser_pool.arun(url)
+        except Exception as e:
+            logger.error(f"Error fetching page content for {url}: {e}")
+            return []
+        if not result.success:
+            logger.error(f"Error fetching page content for {url}: {result.error_message}")
+            return []
+        html = result.html
+        logger.debug(f"Successfully fetched page content for: {url}")
         soup = BeautifulSoup(html, "html.parser")
         links = list(set(a['href'] for a in soup.find_all('a', href=True) if a['href'].startswith("http")))
         logger.debug(f"Found {len(links)} links on {url}")
@@ -34,9 +33,10 @@ class Crawler:
 class Extractor:
     def extract(self, url: str):
         logger.debug(f"Starting to extract content from: {url}")
-        html = trafilatura.fetch_url(url)
-        if not html:
-            logger.warning(f"Failed to fetch HTML for: {url}")
+        try:
+            html = fetcher.fetch_sync(url).text
+        except FetchError as e:
+            logger.warning(f"Failed to fetch HTML for: {url}: {e}")
             return None, None
         text = trafilatura.extract(html)
         soup = BeautifulSoup(html, 'html.parser')
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.models import Article, Profile
+from api.utils import extraction, inference
+from api.utils.fetcher import FetchError, fetcher
+from api.utils.html_archive import html_archive
+from api.utils.link_scoring import link_scorer
+from api.utils.near_duplicates import NEAR_DUP_MODE, cluster_of, near_duplicates, reused_scores
+from api.utils.url_canonical import canonicalize, page_canonical_url
+from api.utils.url_filter import seen_urls
+
+logger = logging.getLogger(__name__)
+
+
+async def extract_article_unstructured_html(url: str, extractor_chain: str = None):
+    """
+    Extract article content with the extractor chain, fetched through the shared fetcher.
+    """
+    try:
+        response = await fetcher.fetch(url)
+    except FetchError as e:
+        logger.error(str(e))
+        return None
+
+    # extraction runs in the worker pool, off the event loop
+    article = await extraction.aextract(response.text, url, extractor_chain)
+    if article is None:
+        return None
+
+    return {
+        "url": page_canonical_url(response.url, response.text),
+        "title": article["title"],
+        "content": article["content"],
+        "page": response,
+    }
+
+
+async def _archive(result: dict):
+    # only pages that passed the article check are kept, not every fetched link
+    page = result["page"]
+    if html_archive and not page.not_modified:
+        await asyncio.to_thread(html_archive.store, result["url"], page.text, page.url)
+
+
+def _is_article(url: str, result) -> bool:
+    if not result:
+        logger.info(f"Failed to extract article from {url}. Skipping.")
+        return False
+    title = result.get("title")
+    content = result.get("content")
+    if not title or len(title.split()) < 5 or not content or len(content) < 1000:
+        logger.info(f"Incomplete or insufficient content from {url}. Skipping.")
+        return False
+    return True
+
+
+def _drop_stored(db: Session, extracted: list) -> list:
+    # a page's rel=canonical link can name a story that is already stored
+    fresh = set(seen_urls.filter_new(db, [result["url"] for result in extracted]))
+    unique = []
+    for result in extracted:
+        if result["url"] not in fresh:
+            logger.info(f"Canonical URL {result['url']} already stored. Skipping.")
+            continue
+        fresh.discard(result["url"])
+        unique.append(result)
+    return unique
+
+
+def _predicted_scores(classification: str, sentiment: dict) -> dict:
+    scores = sentiment.get("scores", {})
+    return dict(
+        classification=classification,
+        sentiment=sentiment["sentiment"],
+        ministry_to_report=inference.CATEGORY_MINISTRY_MAPPING.get(classification, "Unknown"),
+        positive_sentiment=int(scores.get("positive", 0) * 100),
+        negative_sentiment=int(scores.get("negative", 0) * 100),
+        neutral_sentiment=int(scores.get("neutral", 0) * 100),
+    )
+
+
+async def _score_and_store(db: Session, profile: Profile, extracted: list):
+    # Syndicated copies of stored stories reuse their scores
+    matches = near_duplicates.match_stored(db, [result["content"] for result in extracted])
+    if NEAR_DUP_MODE == "skip":
+        for result, (_, duplicate) in zip(extracted, matches):
+            near_duplicates.record(duplicate)
+            if duplicate is not None:
+                # dropped copies have no row; without this every crawl would fetch them again
+                seen_urls.mark_unstored(result["url"])
+                seen_urls.mark_unstored(result["link_url"])
+        kept = [(result, match) for result, match in zip(extracted, matches) if match[1] is None]
+        extracted, matches = [result for result, _ in kept], [match for _, match in kept]
+
+    # Score every article of the profile together so the
+    # inference engine can batch them into a few forward passes.
+    contents = [result["content"] for result, (_, duplicate) in zip(extracted, matches) if duplicate is None]
+    predictions = iter(await inference.aclassify_articles(contents) if contents else [])
+
+    for result, (signature, duplicate) in zip(extracted, matches):
+        if duplicate is not None:
+            near_duplicates.record(duplicate)
+            scored = reused_scores(duplicate)
+        else:
+            classification, sentiment = next(predictions)
+            logger.debug(f"Classified as {classification}, Sentiment: {sentiment}")
+            scored = _predicted_scores(classification, sentiment)
+
+        article = Article(
+            source_id=profile.id,
+            url=result["url"],
+            title=result["title"],
+            content=result["content"],
+            **scored,
+        )
+        try:
+            db.add(article)
+            db.flush()
+            article.cluster_id = cluster_of(article, duplicate)
+            db.commit()
+        except IntegrityError:
+            # stored by another worker since the seen-URL check
+            db.rollback()
+            seen_urls.add(result["url"])
+            logger.info(f"Article {result['url']} already stored. Skipping.")
+            continue
+        db.refresh(article)
+        seen_urls.add(article.url)
+        near_duplicates.add(article.id, article.cluster_id, signature)
+        logger.info(f"Article saved: {article.title} from {article.url}")
+
+
+async def crawl_profile(db: Session, profile: Profile, urls: list, max_links: int = None) -> bool:
+    """
+    Fetch, extract, score and store the new articles among a profile's
+    discovered links, spending at most `max_links` fetches (None tries
+    every new link) on the best-ranked ones. Returns whether the budget
+    left new links untried, in which case last_crawled must not advance.
+    """
+    links = {}
+    for link_obj in urls:
+        links.setdefault(canonicalize(link_obj["href"]), link_obj)
+    new_urls = seen_urls.filter_new(db, list(links))
+    # rows stored before canonicalization keep the URL as it was discovered
+    raw_new = set(seen_urls.filter_new(db, [links[url]["href"] for url in new_urls]))
+    new_urls = [url for url in new_urls if links[url]["href"] in raw_new]
+    logger.debug(f"{len(urls) - len(new_urls)} URLs already stored or repeated")
+
+    candidates = []
+    for url in new_urls:
+        if len(url) < 50:
+            logger.info(f"URL too short: {url}. Skipping.")
+            continue
+        candidates.append(url)
+
+    # Spend the fetch budget on the links most likely to be articles
+    ranked = link_scorer.rank(profile.base_url, [(url, links[url].get("text", "")) for url in candidates])
+    candidates = ranked if max_links is None else ranked[:max_links]
+    budget_exhausted = len(ranked) > len(candidates)
+
+    # Fetch every candidate concurrently; the canonical form is only
+    # the dedup key, the link is fetched as discovered
+    results = await asyncio.gather(*(
+        extract_article_unstructured_html(links[url]["href"], profile.extractor_chain)
+        for url in candidates
+    ))
+
+    extracted = []
+    for url, result in zip(candidates, results):
+        accepted = _is_article(url, result)
+        link_scorer.record(url, accepted)
+        if accepted:
+            extracted.append(dict(result, link_url=url))
+    link_scorer.save()
+    await asyncio.gather(*(_archive(result) for result in extracted))
+
+    extracted = _drop_stored(db, extracted)
+    if extracted:
+        await _score_and_store(db, profile, extracted)
+    else:
+        logger.info(f"No new articles extracted for profile: {profile.name}")
+    return budget_exhausted
@@ -1,14 +1,16 @@
 import logging
 import requests
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from unstructured.documents.elements import Title, NarrativeText
-from unstructured.partition.html import partition_html
-from numpy import argmax
-from tensorflow.nn import softmax as tf_softmax
 import os
 
 from api.models import Article
-from api.ml_models import get_model
+from api.utils import extraction, inference
+from api.utils.fetcher import FetchError, fetcher
+from api.utils.html_archive import html_archive
+from api.utils.near_duplicates import NEAR_DUP_MODE, cluster_of, near_duplicates, reused_scores
+from api.utils.url_canonical import canonicalize, page_canonical_url
+from api.utils.url_filter import seen_urls
 
 logger = logging.getLogger(__name__)
 
@@ -24,88 +26,25 @@ headers = {
 class SingleArticleExtractor:
     def __init__(self, db: Session):
         self.db = db
-        self.inverse_category_mapping = {v: k for k, v in {
-            "Entertainment": 0,
-            "Business": 1,
-            "Politics": 2,
-            "Judiciary": 3,
-            "Crime": 4,
-            "Culture": 5,
-            "Sports": 6,
-            "Science": 7,
-            "International": 8,
-            "Technology": 9
-        }.items()}
-        self.category_ministry_mapping = {
-            "Entertainment": "Ministry of Information and Broadcasting",
-            "Business": "Ministry of Finance",
-            "Politics": "Ministry of Parliamentary Affairs",
-            "Judiciary": "Ministry of Law and Justice",
-            "Crime": "Ministry of Home Affairs",
-            "Culture": "Ministry of Culture",
-            "Sports": "Ministry of Youth Affairs and Sports",
-            "Science": "Ministry of Science and Technology",
-            "International": "Ministry of External Affairs",
-            "Technology": "Ministry of Electronics and Information Technology"
-        }
-
-    def extract_html_content(self, url: str, session: requests.Session = None):
-        from api.utils.helpers import get_session_with_agent  # if needed
-        session = session or get_session_with_agent()
 
+    def extract_html_content(self, url: str):
         try:
-            response = session.get(url, timeout=10)
-            response.raise_for_status()
-        except requests.RequestException as e:
+            response = fetcher.fetch_sync(url)
+        except FetchError as e:
             logger.error(f"Request failed for {url}: {e}")
             return None
 
-        elements = partition_html(text=response.text)
-        title = ""
-        content_lines = []
-
-        for el in elements:
-            if isinstance(el, Title) and not title:
-                title = el.text
-            elif isinstance(el, NarrativeText):
-                content_lines.append(el.text)
-
-        content = "\n".join(content_lines).strip()
-        return {
-            "url": url,
-            "title": title.strip(),
-            "content": content.strip()
-        }
-
-    def predict_sentiment(self, text: str):
-        tokenizer = get_model("sentiment_tokenizer")
-        model = get_model("sentiment_model")
-        inputs = tokenizer(text, return_tensors="tf", truncation=True, max_length=512, padding=True)
-        outputs = model(inputs)
-        scores = tf_softmax(outputs.logits, axis=1)[0].numpy()
-    
-        labels = ["negative", "neutral", "positive"]
-        max_score = argmax(scores)
-        sentiment = labels[max_score]
+        article = extraction.extract(response.text, url)
+        if article is None:
+            return None
 
         return {
-            "sentiment": sentiment,
-            "scores": {
-                "negative": scores[0].item(),
-                "neutral": scores[1].item(),
-                "positive": scores[2].item()
-            }
+            "url": page_canonical_url(response.url, response.text),
+            "title": article["title"],
+            "content": article["content"],
+            "page": response,
         }
 
-    def predict_category(self, text: str):
-        tokenizer = get_model("news_tokenizer")
-        model = get_model("news_model")
-        inputs = tokenizer(text, return_tensors="tf", truncation=True, padding=True, max_length=512)
-        outputs = model(inputs)
-        probs = tf_softmax(outputs.logits, axis=1)[0].numpy()
-        predicted_index = argmax(probs)
-        return self.inverse_category_mapping.get(predicted_index, f"label_{predicted_index}")
-
     def detect_language(self, text: str):
         payload = {"text": text}
         response = requests.post(detect_language_url, json=payload, headers=headers)
@@ -130,30 +69,44 @@ class SingleArticleExtractor:
             return None
         
     
+    @staticmethod
+    def article_data(article: Article) -> dict:
+        return {
+            "id": article.id,
+            "url": article.url,
+            "title": article.title,
+            "content": article.content,
+            "classification": article.classification,
+            "sentiment": article.sentiment,
+            "ministry_to_report": article.ministry_to_report,
+            "positive_sentiment": article.positive_sentiment,
+            "negative_sentiment": article.negative_sentiment,
+            "neutral_sentiment": article.neutral_sentiment
+        }
+
     def process(self, url: str):
         logger.info(f"Processing article from URL: {url}")
-        # if the URL is already in the database, then give it back
-        existing_article = self.db.query(Article).filter(Article.url == url).first()
+        # if the URL is already in the database, then give it back; rows
+        # stored before canonicalization keep the URL as it was submitted
+        submitted_url, url = url, canonicalize(url)
+        existing_article = self.db.query(Article).filter(Article.url.in_({url, submitted_url})).first()
         if existing_article:
             logger.info(f"Article already exists in the database: {existing_article.title}")
-            return {
-                "id": existing_article.id,
-                "url": existing_article.url,
-                "title": existing_article.title,
-                "content": existing_article.content,
-                "classification": existing_article.classification,
-                "sentiment": existing_article.sentiment,
-                "ministry_to_report": existing_article.ministry_to_report,
-                "positive_sentiment": existing_article.positive_sentiment,
-                "negative_sentiment": existing_article.negative_sentiment,
-                "neutral_sentiment": existing_article.neutral_sentiment
-            }
+            return self.article_data(existing_article)
             
-        # if not, then extract the article
-        result = self.extract_html_content(url)
+        # if not, then extract the article from the URL as submitted
+        result = self.extract_html_content(submitted_url)
         if not result:
             return None
 
+        # the page may declare a different canonical URL that is already stored
+        if result["url"] != url:
+            url = result["url"]
+            existing_article = self.db.query(Article).filter(Article.url == url).first()
+            if existing_article:
+                logger.info(f"Article already exists under its canonical URL: {url}")
+                return self.article_data(existing_article)
+
         title = result.get("title")
         content = result.get("content")
 
@@ -166,6 +119,11 @@ class SingleArticleExtractor:
             logger.warning(f"Content too short for analysis from URL: {url}")
             return None
 
+        # only pages that pass the content check are archived
+        page = result["page"]
+        if html_archive and not page.not_modified:
+            html_archive.store(url, page.text, page.url)
+
         # detect language
         language_data = self.detect_language(content)
         if not language_data:
@@ -183,11 +141,27 @@ class SingleArticleExtractor:
         else:
             logger.info(f"Content is already in English for URL: {url}")
             
-        # predict sentiment and category
-        sentiment_data = self.predict_sentiment(content)
-        classification = self.predict_category(content)
-        scores = sentiment_data["scores"]
-        ministry = self.category_ministry_mapping.get(classification, "Unknown")
+        # a near-duplicate of a stored story reuses its scores, or is that story when copies are skipped
+        signature, duplicate = near_duplicates.match_stored(self.db, [content])[0]
+        near_duplicates.record(duplicate)
+        if duplicate is not None and NEAR_DUP_MODE == "skip":
+            return self.article_data(duplicate)
+
+        if duplicate is not None:
+            scored = reused_scores(duplicate)
+        else:
+            # predict sentiment and category
+            # concurrent /detect requests are batched together by the inference engine
+            classification, sentiment_data = inference.classify_articles([content])[0]
+            scores = sentiment_data["scores"]
+            scored = dict(
+                classification=classification,
+                sentiment=sentiment_data["sentiment"],
+                ministry_to_report=inference.CATEGORY_MINISTRY_MAPPING.get(classification, "Unknown"),
+                positive_sentiment=int(scores.get("positive", 0) * 100),
+                negative_sentiment=int(scores.get("negative", 0) * 100),
+                neutral_sentiment=int(scores.get("neutral", 0) * 100),
+            )
 
         # create a new article object
         article = Article(
@@ -195,28 +169,23 @@ class SingleArticleExtractor:
             url=url,
             title=title,
             content=content,
-            classification=classification,
-            sentiment=sentiment_data["sentiment"],
-            ministry_to_report=ministry,
-            positive_sentiment=int(scores.get("positive", 0) * 100),
-            negative_sentiment=int(scores.get("negative", 0) * 100),
-            neutral_sentiment=int(scores.get("neutral", 0) * 100),
+            **scored,
         )
         # save to database
-        self.db.add(article)
-        self.db.commit()
+        try:
+            self.db.add(article)
+            self.db.flush()
+            article.cluster_id = cluster_of(article, duplicate)
+            self.db.commit()
+        except IntegrityError:
+            # a concurrent request or crawl stored the same URL first
+            self.db.rollback()
+            seen_urls.add(url)
+            existing_article = self.db.query(Article).filter(Article.url == url).first()
+            return self.article_data(existing_article) if existing_article else None
         self.db.refresh(article)
+        seen_urls.add(article.url)
+        near_duplicates.add(article.id, article.cluster_id, signature)
         logger.info(f"Article saved: {article.title} from {article.url}")
         # return the article data
-        return {
-            "id": article.id,
-            "url": article.url,
-            "title": article.title,
-            "content": article.content,
-            "classification": article.classification,
-            "sentiment": article.sentiment,
-            "ministry_to_report": article.ministry_to_report,
-            "positive_sentiment": article.positive_sentiment,
-            "negative_sentiment": article.negative_sentiment,
-            "neutral_sentiment": article.neutral_sentiment
-        }
+        return self.article_data(article)
@@ -0,0 +1,128 @@
+import html
+import json
+import logging
+import os
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change which story a URL points to
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "ref", "ref_src", "ref_url", "cmpid", "ocid", "ito", "amp", "outputtype", "share",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+# Per-domain rules, matched on the host or any parent domain:
+#   keep_params - the only query parameters that identify an article (empty: drop the query)
+#   host        - the one host name the site serves articles from (folds www., amp., bare)
+DOMAIN_RULES = {
+    "thehindu.com": {"keep_params": (), "host": "www.thehindu.com"},
+    "deccanherald.com": {"keep_params": (), "host": "www.deccanherald.com"},
+    "theguardian.com": {"keep_params": (), "host": "www.theguardian.com"},
+    "inshorts.com": {"keep_params": ()},
+    "indianexpress.com": {"keep_params": ()},
+    "hindustantimes.com": {"keep_params": ()},
+    "ndtv.com": {"keep_params": ()},
+    "timesofindia.indiatimes.com": {"keep_params": ()},
+}
+
+# Extra rules as a JSON object of the same shape, merged over the built-in ones
+URL_CANONICAL_RULES = os.getenv("URL_CANONICAL_RULES")
+if URL_CANONICAL_RULES:
+    try:
+        with open(URL_CANONICAL_RULES) as f:
+            DOMAIN_RULES.update(json.load(f))
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load URL canonicalization rules from {URL_CANONICAL_RULES}: {e}")
+
+_LINK_TAG = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+_ATTRIBUTE = re.compile(r"""([\w-]+)\s*=\s*("[^"]*"|'[^']*'|[^\s>]+)""")
+_HEAD_END = re.compile(r"</head\s*>", re.IGNORECASE)
+
+
+def _rules(host: str) -> dict:
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        rules = DOMAIN_RULES.get(".".join(parts[i:]))
+        if rules is not None:
+            return rules
+    return {}
+
+
+def _strip_amp(host: str, path: str):
+    if host.startswith("amp."):
+        host = host[len("amp."):]
+    # /story/amp, /story/amp/, /amp/story and story.amp.html variants
+    path = re.sub(r"/amp/?$", "", path)
+    path = re.sub(r"^/amp(?=/)", "", path)
+    path = re.sub(r"\.amp(\.\w+)$", r"\1", path)
+    return host, path
+
+
+def canonicalize(url: str) -> str:
+    """
+    Normalize an article URL so trivially different links to one story map
+    to the same string: https, lower-case host without default port, no
+    fragment, no tracking or AMP markers, no trailing slash and a sorted
+    query. Non-HTTP URLs are returned unchanged.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    host, path = _strip_amp(host, path)
+
+    rules = _rules(host.split(":")[0])
+    host = rules.get("host", host)
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    keep = rules.get("keep_params")
+    if keep is not None:
+        query = [(key, value) for key, value in query if key in keep]
+
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def head_links(page_html: str) -> list:
+    """Attributes of every <link> tag in the head of a page, with lower-case names."""
+    head_end = _HEAD_END.search(page_html)
+    head = page_html[:head_end.start()] if head_end else page_html[:200_000]
+    return [
+        {name.lower(): html.unescape(value.strip("\"'")) for name, value in _ATTRIBUTE.findall(tag)}
+        for tag in _LINK_TAG.findall(head)
+    ]
+
+
+def find_canonical_link(page_url: str, page_html: str):
+    """Return the canonicalized <link rel="canonical"> target of a page, if it declares a usable one."""
+    for attributes in head_links(page_html):
+        if "canonical" not in attributes.get("rel", "").lower().split() or not attributes.get("href"):
+            continue
+        target = canonicalize(urljoin(page_url, attributes["href"]))
+        if not target.startswith("https://"):
+            return None
+        # some sites point every page at their home page; that is not this article
+        if urlsplit(target).path == "/" and urlsplit(page_url).path not in ("", "/"):
+            return None
+        return target
+    return None
+
+
+def page_canonical_url(page_url: str, page_html: str) -> str:
+    """Canonical URL of a fetched page: its declared canonical link, else the normalized page URL."""
+    return find_canonical_link(page_url, page_html) or canonicalize(page_url)
@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+
+from sqlalchemy.orm import Session
+
+from api.models import Article
+
+logger = logging.getLogger(__name__)
+
+SEEN_URL_CAPACITY = int(os.getenv("SEEN_URL_CAPACITY", "2000000"))
+SEEN_URL_ERROR_RATE = float(os.getenv("SEEN_URL_ERROR_RATE", "0.001"))
+# Crawled URLs that were deliberately not stored (e.g. skipped near-duplicates), oldest forgotten first
+SEEN_URL_UNSTORED_CAPACITY = int(os.getenv("SEEN_URL_UNSTORED_CAPACITY", "100000"))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class SeenUrlFilter:
+    """
+    Process-wide probabilistic set of stored article URLs. A URL the filter
+    has never seen is certainly new and needs no database lookup; the few
+    that might be known are confirmed together in one set-based query.
+    """
+
+    def __init__(self, capacity: int = SEEN_URL_CAPACITY, error_rate: float = SEEN_URL_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._added_during_rebuild = None
+        # insertion-ordered set; it has no rows to be rebuilt from, so it only lives in this process
+        self._unstored = {}
+        self.ready = False
+        self.stats = {"checked": 0, "skipped_lookup": 0, "looked_up": 0, "known": 0, "unstored": 0}
+
+    def rebuild(self, db: Session):
+        with self._lock:
+            self._added_during_rebuild = []
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        count = 0
+        try:
+            for (url,) in db.query(Article.url).yield_per(10000):
+                bloom.add(url)
+                count += 1
+            with self._lock:
+                # URLs saved while the query ran may be missing from its results
+                for url in self._added_during_rebuild:
+                    bloom.add(url)
+                self._bloom = bloom
+                self.ready = True
+        finally:
+            with self._lock:
+                self._added_during_rebuild = None
+        logger.info(f"Seen-URL filter rebuilt from {count} articles")
+
+    def add(self, url: str):
+        with self._lock:
+            self._bloom.add(url)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(url)
+
+    def mark_unstored(self, url: str):
+        """Remember a URL that was crawled but not stored, so later crawls do not fetch it again."""
+        with self._lock:
+            self._unstored[url] = None
+            if len(self._unstored) > SEEN_URL_UNSTORED_CAPACITY:
+                del self._unstored[next(iter(self._unstored))]
+
+    def filter_new(self, db: Session, urls: list) -> list:
+        """Return the URLs (deduplicated, in order) that are neither stored nor marked unstored."""
+        urls = list(dict.fromkeys(urls))
+        with self._lock:
+            unstored = len(urls)
+            urls = [url for url in urls if url not in self._unstored]
+            self.stats["unstored"] += unstored - len(urls)
+            maybe_known = [url for url in urls if url in self._bloom] if self.ready else urls
+
+        known = set()
+        if maybe_known:
+            known = {url for (url,) in db.query(Article.url).filter(Article.url.in_(maybe_known)).all()}
+
+        with self._lock:
+            self.stats["checked"] += len(urls)
+            self.stats["skipped_lookup"] += len(urls) - len(maybe_known)
+            self.stats["looked_up"] += len(maybe_known)
+            self.stats["known"] += len(known)
+        return [url for url in urls if url not in known]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, ready=self.ready, unstored_size=len(self._unstored))
+
+
+seen_urls = SeenUrlFilter()
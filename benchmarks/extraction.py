@@ -0,0 +1,122 @@
+"""
+Speed and output comparison of the article extractors.
+
+Runs every extractor of api.utils.extraction over a saved HTML corpus and
+prints a JSON report: per-document latency, how often each one yields an
+article the pipelines would keep, and how much of the unstructured output
+the other extractors reproduce. The corpus is a directory of *.html files;
+by default the page cache (HTTP_CACHE_DIR) is used.
+
+    python -m benchmarks.extraction --corpus saved_pages/ --limit 200
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+WORD = re.compile(r"\w+")
+
+
+def load_corpus(directory: str, limit: int) -> list:
+    documents = []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            if name.endswith((".html", ".htm", ".body")):
+                with open(os.path.join(root, name), encoding="utf-8", errors="replace") as f:
+                    documents.append((name, f.read()))
+                if len(documents) >= limit:
+                    return documents
+    return documents
+
+
+def word_overlap(reference: str, candidate: str) -> dict:
+    """Precision / recall of candidate words against the reference text, as bags of lower-case words."""
+    ref = WORD.findall(reference.lower())
+    cand = WORD.findall(candidate.lower())
+    if not ref or not cand:
+        return {"precision": None, "recall": None}
+    ref_counts, cand_counts = {}, {}
+    for word in ref:
+        ref_counts[word] = ref_counts.get(word, 0) + 1
+    for word in cand:
+        cand_counts[word] = cand_counts.get(word, 0) + 1
+    common = sum(min(count, ref_counts.get(word, 0)) for word, count in cand_counts.items())
+    return {"precision": common / len(cand), "recall": common / len(ref)}
+
+
+def _mean(values: list):
+    values = [v for v in values if v is not None]
+    return round(float(np.mean(values)), 4) if values else None
+
+
+def run(documents: list, reference: str = "unstructured") -> dict:
+    from api.utils.extraction import EXTRACTION_MIN_CHARS, EXTRACTORS
+
+    outputs = {name: [] for name in EXTRACTORS}
+    timings = {name: [] for name in EXTRACTORS}
+    errors = {name: 0 for name in EXTRACTORS}
+    for _, html in documents:
+        for name, extractor in EXTRACTORS.items():
+            started = time.perf_counter()
+            try:
+                article = extractor(html)
+            except Exception:
+                article = {"title": "", "content": ""}
+                errors[name] += 1
+            timings[name].append(time.perf_counter() - started)
+            outputs[name].append(article)
+
+    report = {}
+    for name in EXTRACTORS:
+        overlaps = [
+            word_overlap(ref["content"], article["content"])
+            for ref, article in zip(outputs[reference], outputs[name])
+        ]
+        report[name] = {
+            "documents": len(documents),
+            "errors": errors[name],
+            "ms_per_doc": {
+                "mean": round(float(np.mean(timings[name])) * 1000, 2),
+                "p50": round(float(np.percentile(timings[name], 50)) * 1000, 2),
+                "p95": round(float(np.percentile(timings[name], 95)) * 1000, 2),
+            },
+            "usable": sum(
+                1 for article in outputs[name]
+                if len(article["title"].split()) >= 5 and len(article["content"]) >= EXTRACTION_MIN_CHARS
+            ),
+            "avg_chars": round(float(np.mean([len(article["content"]) for article in outputs[name]])), 1),
+            f"precision_vs_{reference}": _mean([o["precision"] for o in overlaps]),
+            f"recall_vs_{reference}": _mean([o["recall"] for o in overlaps]),
+        }
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the article extractors")
+    parser.add_argument("--corpus", default=os.getenv("HTTP_CACHE_DIR") or "http_cache",
+                        help="Directory of saved HTML pages (*.html, or *.body files of the page cache)")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of pages to use")
+    parser.add_argument("--reference", default="unstructured", help="Extractor the others are compared against")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    documents = load_corpus(args.corpus, args.limit)
+    if not documents:
+        raise SystemExit(f"No HTML pages found in {args.corpus}")
+    print(f"Extracting {len(documents)} pages from {args.corpus}", file=sys.stderr)
+
+    report = json.dumps({"corpus": args.corpus, "results": run(documents, args.reference)}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Throughput and latency benchmark for the shared inference engine.
+
+Drives api.utils.inference with a fixed, seeded corpus of article texts and
+prints a JSON report per configuration. By default both models are tiny
+randomly initialised transformers built offline; pass --model real to load
+the real checkpoints from the local Hugging Face cache or MODEL_DIR.
+
+    python -m benchmarks.inference --batch-sizes 1,16,32 --concurrency 1,8 --lengths 100,400,2000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+VOCABULARY = (
+    "government minister court police election market shares cricket match film festival "
+    "science research university technology startup budget parliament bill opposition party "
+    "verdict judge crime arrest culture music heritage international summit trade border "
+    "growth inflation bank rupee investors players team coach space mission climate health "
+    "hospital officials said on monday the a of and in to for with after report new city state"
+).split()
+
+
+def build_corpus(count: int, words: int, seed: int = 0) -> list:
+    rng = random.Random(f"{seed}-{words}")
+    texts = []
+    for i in range(count):
+        # vary lengths around the target so batches mix short and long articles
+        length = max(5, int(words * rng.uniform(0.5, 1.5)))
+        texts.append(f"Article {i}. " + " ".join(rng.choice(VOCABULARY) for _ in range(length)))
+    return texts
+
+
+def build_stub_models():
+    """Tiny random DistilBERT classifiers with a word-level tokenizer, built without network access."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import DistilBertConfig, PreTrainedTokenizerFast, TFDistilBertForSequenceClassification
+
+    vocab = {token: i for i, token in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + VOCABULARY)}
+    backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])]
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, model_max_length=512,
+        pad_token="[PAD]", unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]",
+    )
+
+    stubs = {}
+    for kind, num_labels in (("sentiment", 3), ("news", 10)):
+        config = DistilBertConfig(
+            vocab_size=len(vocab), dim=64, hidden_dim=128, n_layers=2, n_heads=2, num_labels=num_labels
+        )
+        stubs[f"{kind}_model"] = TFDistilBertForSequenceClassification(config)
+        stubs[f"{kind}_tokenizer"] = tokenizer
+    return stubs
+
+
+def install_models(use_real: bool):
+    from api import ml_models
+
+    if use_real:
+        ml_models.load_models()
+        failed = {k: s["error"] for k, s in ml_models.get_model_status().items() if s["state"] != "ready"}
+        if failed:
+            raise SystemExit(f"Could not load the real models from the local cache: {failed}")
+        return
+
+    stubs = build_stub_models()
+    if ml_models.COMPILE_MODELS:
+        from api.utils.compiled_models import compile_classifier
+        for kind in ml_models.MODEL_PATHS:
+            stubs[f"{kind}_model"], _ = compile_classifier(kind, stubs[f"{kind}_model"])
+    ml_models.ml_models.update(stubs)
+    for status in ml_models.model_status.values():
+        status["state"] = "ready"
+
+
+def percentile(values: list, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else None
+
+
+def run_case(texts: list, batch_size: int, concurrency: int) -> dict:
+    from api.utils import inference
+    from api.utils.inference_cache import InferenceCache
+
+    # fresh batchers for this batch size and no cache, so every text is really scored
+    inference.MAX_BATCH_SIZE = batch_size
+    inference._batchers.clear()
+    for kind in ("sentiment", "news"):
+        inference._batchers[kind] = inference.MicroBatcher(kind, max_batch_size=batch_size)
+    inference.inference_cache = InferenceCache(max_entries=0, path=None)
+    inference.padding_stats.clear()
+
+    latencies = []
+
+    def score(text):
+        started = time.perf_counter()
+        inference.classify_articles([text])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(score, texts))
+    elapsed = time.perf_counter() - started
+
+    padding = inference.get_padding_stats()
+    efficiencies = [report["efficiency"] for report in padding.values() if report["efficiency"]]
+    return {
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "articles": len(texts),
+        "articles_per_sec": round(len(texts) / elapsed, 2),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+        "padding_waste": round(1 - float(np.mean(efficiencies)), 4) if efficiencies else None,
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the inference engine")
+    parser.add_argument("--model", choices=["stub", "real"], default="stub")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8])
+    parser.add_argument("--lengths", type=_int_list, default=[100, 400, 1500], help="Average words per article")
+    parser.add_argument("--articles", type=int, default=128, help="Articles per configuration")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.model == "real":
+        # only use checkpoints that are already on disk
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    install_models(args.model == "real")
+
+    results = []
+    for words in args.lengths:
+        texts = build_corpus(args.articles, words)
+        for batch_size in args.batch_sizes:
+            for concurrency in args.concurrency:
+                case = run_case(texts, batch_size, concurrency)
+                case["avg_words"] = words
+                results.append(case)
+                print(f"words={words} batch={batch_size} concurrency={concurrency}: "
+                      f"{case['articles_per_sec']} articles/s", file=sys.stderr)
+
+    report = json.dumps({"model": args.model, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
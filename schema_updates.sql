@@ -0,0 +1,7 @@
+-- Columns added after the initial schema. create_all() does not alter
+-- existing tables, so apply these to databases created before them.
+
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS js_rendered BOOLEAN;
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS extractor_chain VARCHAR;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS cluster_id INTEGER;
+CREATE INDEX IF NOT EXISTS ix_articles_cluster_id ON articles (cluster_id);